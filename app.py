@@ -1,273 +1,566 @@
-from flask import Flask, jsonify, request
-import json
+import importlib
 import os
-import firebase_admin
-from firebase_admin import credentials, firestore, initialize_app
-from races import get_race_by_id, search_races, clear_cache as clear_race_cache
-from drivers import get_driver_by_id, get_drivers_by_team, get_top_drivers, get_drivers_sorted_by_points, search_drivers, clear_cache as clear_driver_cache
-from sessions import get_race_sessions, clear_cache as clear_session_cache
-from teams import get_team_by_id, get_team_by_driver, get_teams_sorted_by_points, get_top_teams, search_teams, clear_cache as clear_team_cache
-from circuits import get_circuit_info, clear_cache as clear_circuit_cache
-from results import parse_session_results
-from update_firestore_data import update_all, update_races, update_drivers, update_teams, update_circuits, update_sessions
-
-app = Flask(__name__)
-
-# === Firebase setup ===
-firebase_key_path = os.getenv('FIREBASE_KEY_PATH')
-
-if not firebase_admin._apps:
-    # If running locally, fallback to loading the local JSON key
-    if not firebase_key_path:
-        firebase_key_path = "C:/Users/User/OneDrive - National Institute of Business Management (1)/Personal/MAD/Coursework/formula-one-api.json"
-        cred = credentials.Certificate(firebase_key_path)
-    else:
-        firebase_key_path_dict = json.loads(firebase_key_path)
-        cred = credentials.Certificate(firebase_key_path_dict)
-
-    firebase_admin.initialize_app(cred)
-
-db = firestore.client()
+import threading
+from datetime import datetime, timezone
+
+from flask import Blueprint, Flask, Response, current_app, g, has_app_context, jsonify, request
+
+import metrics
+from firebase import get_db
+from indexes import build_driver_index, build_race_index, build_team_index
+from logs import configure_logging
+from responses import json_response
+from seasons import CURRENT_SEASON, SeasonError, is_frozen, parse_season, season_collection
+from listing import apply_list_args, non_negative_int, parse_list_args
+from snapshots import CollectionSnapshot
+from scheduler import RefreshScheduler, interval_for
+from cadence import current_phase, current_interval, next_refresh_time, next_session_start
+from writebehind import WriteBehindQueue
+
+# === Deferred imports ===
+# The scrapers pull in requests, BeautifulSoup and lxml, and the update jobs firebase_admin, which
+# together take longer to import than most requests take to serve. They are imported on first call,
+# so a cold start only loads what the requests it serves actually use.
+
+def deferred(module_name, function_name):
+    """Returns a function calling module_name.function_name, importing the module on first call."""
+    def call(*args, **kwargs):
+        return getattr(importlib.import_module(module_name), function_name)(*args, **kwargs)
+    call.__name__ = function_name
+    return call
+
+clear_race_cache = deferred('races', 'clear_cache')
+clear_driver_cache = deferred('drivers', 'clear_cache')
+get_race_sessions = deferred('sessions', 'get_race_sessions')
+clear_session_cache = deferred('sessions', 'clear_cache')
+clear_team_cache = deferred('teams', 'clear_cache')
+clear_circuit_cache = deferred('circuits', 'clear_cache')
+get_race_results = deferred('results', 'get_race_results')
+clear_results_cache = deferred('results', 'clear_cache')
+cache_stats = deferred('cache', 'cache_stats')
+run_concurrently = deferred('fetcher', 'run_concurrently')
+update_all = deferred('update_firestore_data', 'update_all')
+update_races = deferred('update_firestore_data', 'update_races')
+update_drivers = deferred('update_firestore_data', 'update_drivers')
+update_teams = deferred('update_firestore_data', 'update_teams')
+update_circuits = deferred('update_firestore_data', 'update_circuits')
+update_sessions = deferred('update_firestore_data', 'update_sessions')
+get_last_refreshes = deferred('update_firestore_data', 'get_last_refreshes')
+record_refresh = deferred('update_firestore_data', 'record_refresh')
+write_race_fields = deferred('update_firestore_data', 'write_race_fields')
+load_season = deferred('update_firestore_data', 'load_season')
+
+api = Blueprint('api', __name__)
+
+# === Instrumentation ===
+# Every request is timed per route, and the time it spent in each stage (see metrics.span)
+# is sent back in its Server-Timing header
+
+@api.before_app_request
+def start_timing():
+    request.environ['f1.timing'] = metrics.start_request()
+
+@api.after_app_request
+def add_server_timing(response):
+    timing = request.environ.get('f1.timing')
+    if timing is not None:
+        response.headers['Server-Timing'] = timing.header()
+        # The rule, not the path, so that e.g. every race ID shares one series
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.finish_request(timing, request.method, route, response.status_code)
+    return response
+
+@api.teardown_app_request
+def end_timing(exc):
+    timing = request.environ.get('f1.timing')
+    if timing is not None:
+        metrics.end_request(timing)
+
+@api.errorhandler(SeasonError)
+def season_error(e):
+    return jsonify({'error': str(e)}), 400
+
+def requested_season():
+    """The season asked for with ?season=, the current one by default."""
+    return parse_season(request.args.get('season'))
 
 # === Firestore read helper ===
-def fetch_from_firestore(collection_name):
-    collection_ref = db.collection(collection_name)
-    docs = collection_ref.stream()
-    return [doc.to_dict() for doc in docs if doc.id != "metadata"]
+# Set FIRESTORE_LISTENER=1 on long-running servers to track collection changes with on_snapshot listeners
+use_listeners = os.getenv('FIRESTORE_LISTENER') == '1'
+snapshots = {}
+snapshots_lock = threading.Lock()
+
+def get_snapshot(collection_name, frozen=False):
+    """Returns the CollectionSnapshot of `collection_name`, connecting to Firestore on first use."""
+    snapshot = snapshots.get(collection_name)
+    if snapshot is not None:
+        return snapshot
+    with snapshots_lock:
+        if collection_name not in snapshots:
+            # Frozen collections never change, so they don't need a listener
+            snapshots[collection_name] = CollectionSnapshot(
+                get_db(), collection_name, listen=use_listeners and not frozen, frozen=frozen
+            )
+        return snapshots[collection_name]
+
+def fetch_from_firestore(collection_name, frozen=False):
+    if not has_app_context():
+        return get_snapshot(collection_name, frozen).get()
+
+    # Every read within one request, including all sub-requests of a batch, sees the same snapshot
+    collections = g.setdefault('collections', {})
+    if collection_name not in collections:
+        collections[collection_name] = get_snapshot(collection_name, frozen).get()
+    return collections[collection_name]
+
+def fetch_races(season=CURRENT_SEASON):
+    """The stored races of `season`: the 'races' collection, or seasons/<season>/races for a past season."""
+    return fetch_from_firestore(season_collection('races', season), frozen=is_frozen(season))
+
+# Lookups and searches run on indexes over the same snapshots, so read routes only serve data
+# the update jobs stored and never scrape. An index is rebuilt whenever its snapshot reloads.
+snapshot_indexes = {}
+
+def fetch_index(collection_name, build, frozen=False, records=None):
+    """The index of the snapshot of `collection_name`; pass `records` if already read, e.g. through the async client."""
+    if records is None:
+        records = fetch_from_firestore(collection_name, frozen)
+    entry = snapshot_indexes.get(collection_name)
+    if entry is None or entry[0] is not records:
+        entry = snapshot_indexes[collection_name] = (records, build(records))
+    return entry[1]
+
+def fetch_race_index(season=CURRENT_SEASON, records=None):
+    return fetch_index(season_collection('races', season), build_race_index, frozen=is_frozen(season), records=records)
+
+def fetch_driver_index():
+    return fetch_index('drivers', build_driver_index)
+
+def fetch_team_index():
+    return fetch_index('teams', build_team_index)
+
+def find_race(race_id, season=CURRENT_SEASON):
+    return fetch_race_index(season).get(race_id)
+
+# === Write-behind ===
+# Read routes never write to Firestore themselves: fields they had to scrape are queued here,
+# merged per race and written in one batch shortly after
+race_writes = WriteBehindQueue('races', write_race_fields, delay=float(os.getenv('F1_WRITE_BEHIND_DELAY', '2')))
+
+def persist_race_field(race, field, value):
+    if value and value != race.get(field):
+        race_writes.put((race.get('season', CURRENT_SEASON), race['race_id']), {field: value})
+
+def stored_results(race):
+    """The sessions stored with their results on a race of a past season (see backfill.py), or None."""
+    sessions = race.get('sessions')
+    if is_frozen(race.get('season', CURRENT_SEASON)) and sessions and any('results' in session for session in sessions):
+        return sessions
+    return None
+
+def list_response(records, id_field):
+    """
+    Serves a list endpoint honouring ?ids=, ?fields=, ?sort=, ?limit= and ?offset= (see listing.py).
+    The unpaginated length is returned in X-Total-Count.
+    """
+    try:
+        list_args = parse_list_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if list_args == parse_list_args({}):
+        response = json_response(records, shared=True)
+        response.headers['X-Total-Count'] = str(len(records))
+        return response
+
+    try:
+        page, total = apply_list_args(records, id_field, **list_args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    response = json_response(page, source=records)
+    response.headers['X-Total-Count'] = str(total)
+    return response
+
+# === Refresh cadence ===
+# Data only changes around sessions, so refreshes follow the race calendar stored with the races
+# (see cadence.py): every few minutes around live sessions, rarely between race weekends.
+
+# Jobs whose data changes more slowly than the calendar phases suggest, in seconds
+MIN_UPDATE_INTERVALS = {'circuits': 86400}
+
+# Update job -> function scraping its data into Firestore, where the snapshots served by requests read it
+UPDATE_JOBS = {
+    'races': update_races,
+    'drivers': update_drivers,
+    'teams': update_teams,
+    'circuits': update_circuits,
+    'sessions': update_sessions
+}
+
+def seconds_until_next_refresh(min_interval=0):
+    now = datetime.now(timezone.utc)
+    return (next_refresh_time(fetch_from_firestore('races'), now, now, min_interval) - now).total_seconds()
+
+def update_if_due(job, force=False):
+    """
+    Runs the `job` update if the race calendar says it is due (or `force` is set), and records when it ran.
+    Returns (whether it ran, its timings if any, when it is due next).
+    """
+    now = datetime.now(timezone.utc)
+    min_interval = MIN_UPDATE_INTERVALS.get(job, 0)
+    due_at = next_refresh_time(fetch_from_firestore('races'), get_last_refreshes().get(job), now, min_interval)
+    if not force and due_at > now:
+        return False, None, due_at
+
+    timings = UPDATE_JOBS[job]()
+    record_refresh(job, now)
+    return True, timings, next_refresh_time(fetch_from_firestore('races'), now, now, min_interval)
+
+# === Background refresh ===
+# Runs the update jobs on long-lived servers that have no cron calling POST /api/update/*. The due
+# check is the same as theirs, so a scheduler and a cron (or several instances) don't scrape twice.
+scheduler = RefreshScheduler()
+for job_name in UPDATE_JOBS:
+    scheduler.register(
+        job_name,
+        interval_for(job_name, lambda job=job_name: seconds_until_next_refresh(MIN_UPDATE_INTERVALS.get(job, 0))),
+        lambda job=job_name: update_if_due(job)
+    )
 
 # === ROUTES ===
 
-@app.route('/api/races', methods=['GET'])
+@api.route('/api/races', methods=['GET'])
 def api_get_schedule():
-    races = fetch_from_firestore('races')
-    return jsonify(races)
+    season = requested_season()
+    races = fetch_races(season)
+    if not races and is_frozen(season):
+        return jsonify({'error': f'Season {season} has not been loaded.'}), 404
+    return list_response(races, 'race_id')
 
-@app.route('/api/races/<int:race_id>', methods=['GET'])
+@api.route('/api/races/<int:race_id>', methods=['GET'])
 def api_get_race_by_id(race_id):
-    race = get_race_by_id(race_id)
-    return jsonify(race) if race else jsonify({'error': 'Race not found'}), 404
+    race = find_race(race_id, requested_season())
+    if not race:
+        return jsonify({'error': 'Race not found'}), 404
+    return json_response(race, shared=True)
 
-@app.route('/api/races/search', methods=['GET'])
+@api.route('/api/races/search', methods=['GET'])
 def api_search_schedule():
     query = request.args.get('q', '').lower()
     if not query:
         return jsonify({'error': 'Missing query parameter ?q='}), 400
-    results = search_races(query)
-    return jsonify(results) if results else jsonify({'message': 'No matching races found.'}), 404
-
-@app.route('/api/races/cache/clear', methods=['POST'])
+    try:
+        limit = non_negative_int(request.args, 'limit')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    results = fetch_race_index(requested_season()).search(query, limit=limit)
+    if not results:
+        return jsonify({'message': 'No matching races found.'}), 404
+    return json_response(results)
+
+@api.route('/api/races/cache/clear', methods=['POST'])
 def api_clear_schedule_cache():
     clear_race_cache()
+    for collection_name, snapshot in list(snapshots.items()):
+        if collection_name == 'races' or collection_name.endswith('/races'):
+            snapshot.invalidate()
     return jsonify({'message': 'Schedule cache cleared.'})
 
-@app.route('/api/races/<int:race_id>/sessions', methods=['GET'])
+@api.route('/api/races/<int:race_id>/sessions', methods=['GET'])
 def api_get_race_sessions(race_id):
-    race_ref = db.collection('races').where('race_id', '==', race_id).limit(1)
-    race_snapshot = race_ref.get()
-
-    if not race_snapshot:
+    race = find_race(race_id, requested_season())
+    if not race:
         return jsonify({'error': f'Race with ID {race_id} not found.'}), 404
 
-    race = race_snapshot[0].to_dict()
-    race_url = race.get('url') or race.get('link')
-
-    sessions = get_race_sessions(race_url)
-    if sessions:
-        db.collection('races').document(race_snapshot[0].id).update({'sessions': sessions})
-        return jsonify(sessions)
-    else:
-        return jsonify({'error': 'No sessions found for this race.'}), 404
+    # Stored by the sessions update; requests don't scrape
+    sessions = race.get('sessions')
+    if not sessions:
+        return jsonify({'error': 'The sessions of this race have not been loaded yet.'}), 503
+    return json_response(sessions, shared=True)
 
-@app.route('/api/races/<int:race_id>/circuit', methods=['GET'])
+@api.route('/api/races/<int:race_id>/circuit', methods=['GET'])
 def api_get_race_circuit(race_id):
-    race_ref = db.collection('races').where('race_id', '==', race_id).limit(1)
-    race_snapshot = race_ref.get()
-
-    if not race_snapshot:
+    race = find_race(race_id, requested_season())
+    if not race:
         return jsonify({'error': f'Race with ID {race_id} not found.'}), 404
 
-    race_doc = race_snapshot[0]
-    race = race_doc.to_dict()
-    race_url = race.get('url') or race.get('link')
-
-    try:
-        circuit_info = get_circuit_info(race_url)
-        db.collection('races').document(race_doc.id).update({'circuit': circuit_info})
-        return jsonify(circuit_info)
-    except Exception as e:
-        return jsonify({'error': 'Failed to fetch circuit info', 'details': str(e)}), 500
+    # Stored by the circuits update; requests don't scrape
+    circuit_info = race.get('circuit')
+    if not circuit_info:
+        return jsonify({'error': 'The circuit of this race has not been loaded yet.'}), 503
+    return json_response(circuit_info, shared=True)
 
-@app.route('/api/races/<int:race_id>/results', methods=['GET'])
+@api.route('/api/races/<int:race_id>/results', methods=['GET'])
 def api_get_race_results(race_id):
     try:
-        # Fetch race document from Firestore
-        race_ref = db.collection('races').where('race_id', '==', race_id).limit(1)
-        race_snapshot = race_ref.get()
-
-        if not race_snapshot:
+        race = find_race(race_id, requested_season())
+        if not race:
             return jsonify({'error': f'Race with ID {race_id} not found.'}), 404
 
-        race_doc = race_snapshot[0]
-        race = race_doc.to_dict()
         race_url = race.get('link')  # Get the race URL from Firestore document
 
         if not race_url:
             return jsonify({'error': f'No URL found for race {race_id}'}), 404
 
-        # Fetch the sessions for this race (or any other logic to fetch sessions)
-        sessions = get_race_sessions(race_url)
-
-        # Fetch and add results to each session
-        for session in sessions:
-            session_name = session.get('name', '').lower()
-            session_url = None
-
-            if 'practice 1' in session_name:
-                session_url = f"{race_url}/practice/1"
-            elif 'practice 2' in session_name:
-                session_url = f"{race_url}/practice/2"
-            elif 'practice 3' in session_name:
-                session_url = f"{race_url}/practice/3"
-            elif 'qualifying' in session_name:
-                session_url = f"{race_url}/starting-grid"
-            elif 'race' in session_name:
-                session_url = f"{race_url}/race-result"
-            elif 'sprint' in session_name:
-                session_url = f"{race_url}/sprint-result"
-            elif 'sprint qualifying' in session_name:
-                session_url = f"{race_url}/sprint-grid"
-            
-            if session_url:
-                # Get the results for this session
-                session_results = parse_session_results(session_url)
-                session['results'] = session_results
-
-        # Update Firestore with the session results
-        db.collection('races').document(race_doc.id).update({'sessions': sessions})
-
-        return jsonify(sessions)
+        sessions = stored_results(race)
+        if sessions:
+            return json_response(sessions, shared=True)
+
+        # The race's sessions, with the results of every session fetched in parallel (and cached once published)
+        sessions = get_race_results(race_url, race.get('sessions') or get_race_sessions(race_url))
+        persist_race_field(race, 'sessions', sessions)
+
+        return json_response(sessions)
     
     except Exception as e:
         return jsonify({'error': f'Failed to fetch race results: {str(e)}'}), 500
 
-@app.route('/api/circuits/cache/clear', methods=['POST'])
+@api.route('/api/results/cache/clear', methods=['POST'])
+def api_clear_results_cache():
+    clear_results_cache()
+    return jsonify({'message': 'Results cache cleared.'})
+
+@api.route('/api/circuits/cache/clear', methods=['POST'])
 def api_clear_circuit_cache():
     clear_circuit_cache()
     return jsonify({'message': 'Circuit cache cleared.'})
 
-@app.route('/api/drivers', methods=['GET'])
+@api.route('/api/drivers', methods=['GET'])
 def api_get_all_drivers():
-    drivers = fetch_from_firestore('drivers')
-    return jsonify(drivers)
+    return list_response(fetch_from_firestore('drivers'), 'driver_id')
 
-@app.route('/api/driver/<int:driver_id>', methods=['GET'])
+@api.route('/api/driver/<int:driver_id>', methods=['GET'])
 def api_get_driver_by_id(driver_id):
-    driver = get_driver_by_id(driver_id)
-    return jsonify(driver) if driver else jsonify({'error': 'Driver not found'}), 404
+    driver = fetch_driver_index().get(driver_id)
+    if not driver:
+        return jsonify({'error': 'Driver not found'}), 404
+    return json_response(driver, shared=True)
 
-@app.route('/api/drivers/team/<string:team_name>', methods=['GET'])
+@api.route('/api/drivers/team/<string:team_name>', methods=['GET'])
 def api_get_drivers_by_team(team_name):
-    drivers = get_drivers_by_team(team_name)
-    return jsonify(drivers) if drivers else jsonify({'error': 'No drivers found'}), 404
+    drivers = fetch_driver_index().group('team', team_name)
+    if not drivers:
+        return jsonify({'error': 'No drivers found'}), 404
+    return json_response(drivers, shared=True)
 
-@app.route('/api/drivers/sorted/points', methods=['GET'])
+@api.route('/api/drivers/sorted/points', methods=['GET'])
 def api_get_sorted_drivers():
-    return jsonify(get_drivers_sorted_by_points())
+    return json_response(fetch_driver_index().by_points, shared=True)
 
-@app.route('/api/drivers/top3', methods=['GET'])
+@api.route('/api/drivers/top3', methods=['GET'])
 def api_get_top3_drivers():
-    return jsonify(get_top_drivers())
+    return json_response(fetch_driver_index().top_by_points(3), shared=True)
 
-@app.route('/api/drivers/search', methods=['GET'])
+@api.route('/api/drivers/search', methods=['GET'])
 def api_search_drivers():
     query = request.args.get('q', '').lower()
     if not query:
         return jsonify({'error': 'Missing query parameter ?q='}), 400
-    results = search_drivers(query)
-    return jsonify(results) if results else jsonify({'message': 'No matching drivers found.'}), 404
-
-@app.route('/api/drivers/cache/clear', methods=['POST'])
+    try:
+        limit = non_negative_int(request.args, 'limit')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    results = fetch_driver_index().search(query, limit=limit)
+    if not results:
+        return jsonify({'message': 'No matching drivers found.'}), 404
+    return json_response(results)
+
+@api.route('/api/drivers/cache/clear', methods=['POST'])
 def api_clear_driver_cache():
     clear_driver_cache()
+    get_snapshot('drivers').invalidate()
     return jsonify({"message": "Driver cache cleared."})
 
-@app.route('/api/teams', methods=['GET'])
+@api.route('/api/teams', methods=['GET'])
 def api_get_teams():
-    teams = fetch_from_firestore('teams')
-    return jsonify(teams)
+    return list_response(fetch_from_firestore('teams'), 'team_id')
 
-@app.route('/api/teams/<int:team_id>', methods=['GET'])
+@api.route('/api/teams/<int:team_id>', methods=['GET'])
 def api_get_team_by_id(team_id):
-    team = get_team_by_id(team_id)
-    return jsonify(team) if team else jsonify({'error': 'Team not found'}), 404
+    team = fetch_team_index().get(team_id)
+    if not team:
+        return jsonify({'error': 'Team not found'}), 404
+    return json_response(team, shared=True)
 
-@app.route('/api/teams/driver', methods=['GET'])
+@api.route('/api/teams/driver', methods=['GET'])
 def api_get_team_by_driver():
     driver_name = request.args.get('name', '').lower()
     if not driver_name:
         return jsonify({'error': 'Missing query parameter ?name='}), 400
-    team = get_team_by_driver(driver_name)
-    return jsonify(team) if team else jsonify({'message': 'No team found for this driver'}), 404
+    teams = fetch_team_index().search(driver_name, limit=1, fields=('drivers',))
+    team = teams[0] if teams else None
+    if not team:
+        return jsonify({'message': 'No team found for this driver'}), 404
+    return json_response(team, shared=True)
 
-@app.route('/api/teams/sort', methods=['GET'])
+@api.route('/api/teams/sort', methods=['GET'])
 def api_sort_teams_by_points():
-    return jsonify(get_teams_sorted_by_points())
+    return json_response(fetch_team_index().by_points, shared=True)
 
-@app.route('/api/teams/top3', methods=['GET'])
+@api.route('/api/teams/top3', methods=['GET'])
 def api_get_top3_teams():
-    return jsonify(get_top_teams())
+    return json_response(fetch_team_index().top_by_points(3), shared=True)
 
-@app.route('/api/teams/search', methods=['GET'])
+@api.route('/api/teams/search', methods=['GET'])
 def api_search_teams():
     query = request.args.get('q', '').lower()
     if not query:
         return jsonify({'error': 'Missing query parameter ?q='}), 400
-    results = search_teams(query)
-    return jsonify(results) if results else jsonify({'message': 'No matching teams found.'}), 404
-
-@app.route('/api/teams/cache/clear', methods=['POST'])
+    try:
+        limit = non_negative_int(request.args, 'limit')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    results = fetch_team_index().search(query, limit=limit)
+    if not results:
+        return jsonify({'message': 'No matching teams found.'}), 404
+    return json_response(results)
+
+@api.route('/api/teams/cache/clear', methods=['POST'])
 def api_clear_team_cache():
     clear_team_cache()
+    get_snapshot('teams').invalidate()
     return jsonify({"message": "Team cache cleared."})
 
-@app.route('/api/sessions/cache/clear', methods=['POST'])
+@api.route('/api/sessions/cache/clear', methods=['POST'])
 def api_clear_session_cache():
     clear_session_cache()
     return jsonify({'message': 'Session cache cleared.'})
 
-@app.route('/api/update/drivers', methods=['POST'])
+# Maximum number of sub-requests in one /api/batch call
+BATCH_LIMIT = int(os.getenv('F1_BATCH_LIMIT', '20'))
+
+def run_sub_request(app, path, collections):
+    with app.test_request_context(path, headers={'Accept-Encoding': 'identity'}):
+        # Share the batch's Firestore snapshots with sub-requests running on other threads
+        g.collections = collections
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            return {'path': path, 'status': 500, 'body': {'error': str(e)}}
+        return {'path': path, 'status': response.status_code, 'body': response.get_json(silent=True)}
+
+@api.route('/api/batch', methods=['POST'])
+def api_batch():
+    """
+    Runs several GET requests in one round trip, e.g.
+    {"requests": ["/api/races/3", "/api/races/3/sessions", "/api/driver/1"]}
+    Returns {"responses": [{"path", "status", "body"}, ...]} in the same order.
+    """
+    paths = (request.get_json(silent=True) or {}).get('requests')
+    if not isinstance(paths, list) or not all(isinstance(path, str) and path.startswith('/api/') for path in paths):
+        return jsonify({'error': 'Expected a JSON body {"requests": ["/api/...", ...]}'}), 400
+    if len(paths) > BATCH_LIMIT:
+        return jsonify({'error': f'At most {BATCH_LIMIT} requests per batch.'}), 400
+
+    app = current_app._get_current_object()
+    collections = g.setdefault('collections', {})
+    responses = run_concurrently(lambda path: run_sub_request(app, path, collections), paths)
+    return json_response({'responses': responses})
+
+@api.route('/api/metrics', methods=['GET'])
+def api_metrics():
+    """Request latencies, stage timings and cache hit ratios of this process, in the Prometheus text format."""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@api.route('/api/cache/stats', methods=['GET'])
+def api_get_cache_stats():
+    return jsonify(cache_stats())
+
+@api.route('/api/refresh/status', methods=['GET'])
+def api_get_refresh_status():
+    now = datetime.now(timezone.utc)
+    races = fetch_from_firestore('races')
+    last_refreshes = get_last_refreshes()
+    next_session = next_session_start(races, now)
+
+    return jsonify({
+        'running': scheduler.running,
+        'jobs': scheduler.status(),
+        'write_behind': race_writes.stats(),
+        'cadence': {
+            'phase': current_phase(races, now),
+            'interval': current_interval(races, now),
+            'next_session': next_session.isoformat() if next_session else None,
+            'updates': {
+                job: {
+                    'last_refresh': last_refreshes[job].isoformat() if job in last_refreshes else None,
+                    'next_refresh': next_refresh_time(races, last_refreshes.get(job), now, MIN_UPDATE_INTERVALS.get(job, 0)).isoformat()
+                }
+                for job in UPDATE_JOBS
+            }
+        }
+    })
+
+def run_scheduled_update(job, message):
+    """
+    Runs the `job` update only when the race calendar says it is due (or ?force=1 is passed),
+    so a frequent cron only causes scrapes around race weekends.
+    """
+    ran, timings, next_refresh = update_if_due(job, force=request.args.get('force') == '1')
+    if not ran:
+        return jsonify({'message': f'Skipped {job} update, not due yet.', 'next_refresh': next_refresh.isoformat()})
+
+    body = {'message': message, 'next_refresh': next_refresh.isoformat()}
+    if timings:
+        body['timings'] = timings
+    return jsonify(body)
+
+@api.route('/api/update/drivers', methods=['POST'])
 def update_driver_data():
-    update_drivers()
-    return jsonify({'message': 'Driver firebase data updated.'})
+    return run_scheduled_update('drivers', 'Driver firebase data updated.')
 
-@app.route('/api/update/teams', methods=['POST'])
+@api.route('/api/update/teams', methods=['POST'])
 def update_team_data():
-    update_teams()
-    return jsonify({'message': 'Team firebase data updated.'})
+    return run_scheduled_update('teams', 'Team firebase data updated.')
 
-@app.route('/api/update/races', methods=['POST'])
+@api.route('/api/update/races', methods=['POST'])
 def update_race_data():
-    update_races()
-    return jsonify({'message': 'Race firebase basic data updated.'})
+    return run_scheduled_update('races', 'Race firebase basic data updated.')
 
-@app.route('/api/update/circuits', methods=['POST'])
+@api.route('/api/update/circuits', methods=['POST'])
 def update_circuit_data():
-    update_circuits()
-    return jsonify({'message': 'Race firebase circuit data updated.'})
+    return run_scheduled_update('circuits', 'Race firebase circuit data updated.')
 
-@app.route('/api/update/sessions', methods=['POST'])
+@api.route('/api/update/sessions', methods=['POST'])
 def update_session_data():
-    update_sessions()
-    return jsonify({'message': 'Race firebase session data updated.'})
-
-@app.route('/api/update', methods=['POST'])
+    return run_scheduled_update('sessions', 'Race firebase session data updated.')
+
+@api.route('/api/update/seasons/<int:season>', methods=['POST'])
+def load_season_data(season):
+    """Loads a past season once; ?force=1 loads it again."""
+    season = parse_season(season)
+    if not is_frozen(season):
+        return jsonify({'error': 'The current season is kept up to date by the other update jobs.'}), 400
+    if not load_season(season, force=request.args.get('force') == '1'):
+        return jsonify({'message': f'Season {season} is already loaded.'})
+    return jsonify({'message': f'Season {season} loaded.'})
+
+@api.route('/api/update', methods=['POST'])
 def update_all_data():
     update_all()
     return jsonify({'message': 'All firebase data updated.'})
 
-@app.route('/', methods=['GET'])
+@api.route('/', methods=['GET'])
 def index():
     return jsonify({"message": "F1 API is running"})
 
+def create_app():
+    """
+    Builds the Flask app. Nothing here connects to Firestore or loads the scrapers:
+    Firebase is initialized by the first request reading Firestore (see firebase.get_db).
+    """
+    configure_logging()
+    app = Flask(__name__)
+    app.register_blueprint(api)
+
+    # Opt-in: deployments usually run the update jobs from a cron, and serverless instances are frozen between requests
+    if os.getenv('F1_REFRESH_SCHEDULER', '0') == '1':
+        scheduler.start()
+    return app
+
+# Entry point for Vercel and WSGI servers
+app = create_app()
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,164 @@
+"""
+Optional async serving mode: `uvicorn asgi:application` (needs the packages in requirements-async.txt).
+
+The race routes (sessions, circuit and results, which may have to wait on formula1.com) run
+natively on the event loop, with httpx and the async Firestore client, so a single process
+can wait on many slow upstream calls at once without holding a thread for each.
+Every other route is served by the Flask app, each request on its own thread.
+"""
+import logging
+import re
+from urllib.parse import parse_qs
+
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+
+import metrics
+from app import app, fetch_race_index, get_snapshot, persist_race_field, race_writes, stored_results
+from seasons import SeasonError, is_frozen, parse_season, season_collection
+from firebase import get_async_db
+from responses import cache_control, dumps, negotiate, not_modified, prepare
+from results import get_race_results_async
+from sessions import get_race_sessions_async
+
+logger = logging.getLogger(__name__)
+
+wsgi_application = WsgiToAsgi(app)
+
+RACE_ROUTE = re.compile(r'^/api/races/(\d+)/(sessions|circuit|results)$')
+
+
+async def find_race_async(race_id, season):
+    snapshot = get_snapshot(season_collection('races', season), frozen=is_frozen(season))
+    races = await snapshot.get_async(get_async_db())
+    # The same index as the Flask routes, built once per snapshot; only the read above is async
+    return fetch_race_index(season, records=races).get(race_id)
+
+
+async def race_sessions(race):
+    sessions = race.get('sessions')
+    if not sessions:
+        return 503, {'error': 'The sessions of this race have not been loaded yet.'}, False
+    return 200, sessions, True
+
+
+async def race_circuit(race):
+    circuit_info = race.get('circuit')
+    if not circuit_info:
+        return 503, {'error': 'The circuit of this race has not been loaded yet.'}, False
+    return 200, circuit_info, True
+
+
+async def race_results(race):
+    race_url = race.get('link')
+    if not race_url:
+        return 404, {'error': f"No URL found for race {race['race_id']}"}, False
+
+    sessions = stored_results(race)
+    if sessions:
+        return 200, sessions, True
+
+    try:
+        sessions = await get_race_results_async(race_url, race.get('sessions') or await get_race_sessions_async(race_url))
+        persist_race_field(race, 'sessions', sessions)
+        return 200, sessions, False
+    except Exception as e:
+        return 500, {'error': f'Failed to fetch race results: {str(e)}'}, False
+
+
+RACE_HANDLERS = {
+    'sessions': race_sessions,
+    'circuit': race_circuit,
+    'results': race_results
+}
+
+
+async def send_json(scope, send, status, data, shared=False, timing=None):
+    """
+    Sends `data` like responses.json_response: compressed, with an ETag, or a 304 when the client has it.
+    Returns the status sent.
+    """
+    request_headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+    headers = [(b'content-type', b'application/json')]
+    if timing is not None:
+        headers.append((b'server-timing', timing.header().encode()))
+
+    if status == 200:
+        # Same key as Flask's request.full_path, so both modes share prepared bodies
+        key = f"{scope['path']}?{scope['query_string'].decode('latin-1')}"
+        prepared = prepare(data, key if shared else None, data if shared else None)
+        encoding, etag = negotiate(prepared, request_headers.get('accept-encoding'))
+        headers += [
+            (b'vary', b'Accept-Encoding'),
+            (b'cache-control', cache_control().encode()),
+            (b'etag', f'"{etag}"'.encode())
+        ]
+        if not_modified(etag, request_headers.get('if-none-match')):
+            status, body = 304, b''
+        else:
+            body = prepared.encode(encoding)
+            if encoding:
+                headers.append((b'content-encoding', encoding.encode()))
+    else:
+        body = dumps(data)
+
+    if status != 304:
+        headers.append((b'content-length', str(len(body)).encode()))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+    return status
+
+
+async def race_route(scope, race_id, route):
+    try:
+        season = parse_season(parse_qs(scope['query_string'].decode('latin-1')).get('season', [None])[0])
+    except SeasonError as e:
+        return 400, {'error': str(e)}, False
+
+    try:
+        race = await find_race_async(race_id, season)
+    except Exception:
+        logger.exception("Failed to read races from Firestore")
+        return 500, {'error': 'Failed to read races.'}, False
+
+    if not race:
+        return 404, {'error': f'Race with ID {race_id} not found.'}, False
+    return await RACE_HANDLERS[route](race)
+
+
+async def handle_race_route(scope, send, race_id, route):
+    timing = metrics.start_request()
+    try:
+        status, data, shared = await race_route(scope, race_id, route)
+        status = await send_json(scope, send, status, data, shared, timing)
+        # Same route label as the Flask rule, so both modes share the series
+        metrics.finish_request(timing, 'GET', f'/api/races/<int:race_id>/{route}', status)
+    finally:
+        metrics.end_request(timing)
+
+
+async def handle_lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            race_writes.flush()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await handle_lifespan(receive, send)
+        return
+
+    if scope['type'] == 'http' and scope['method'] == 'GET':
+        match = RACE_ROUTE.match(scope['path'])
+        if match:
+            await handle_race_route(scope, send, int(match.group(1)), match.group(2))
+            return
+
+    # asgiref runs all WSGI requests on one shared thread unless each gets its own thread-sensitive context
+    async with ThreadSensitiveContext():
+        await wsgi_application(scope, receive, send)
@@ -0,0 +1,249 @@
+"""
+Backfills past seasons into Firestore: the calendar of each season, then the circuit, sessions
+and session results of every race, stored on the race documents of seasons/<season>/races.
+
+Pages are fetched on a pool of --workers threads, and no faster than --rate requests per second
+(the fetcher's per-host rate limit). Races are processed --chunk at a time: the pages of a chunk
+are fetched together, and its changes written in as few batch commits as possible. After every
+chunk, the races done are recorded in the --checkpoint file, so a run that was interrupted picks
+up with the races not written yet when started again. Races whose pages failed to load are left
+out of the checkpoint and retried by the next run. A season is frozen once all its races are done
+(see update_firestore_data.freeze_season), and skipped from then on unless --force is passed.
+
+With --fixtures, pages are served from a directory recorded with benchmarks.record_fixtures (or
+generated with benchmarks.synthetic_fixtures) and written to the in-memory Firestore of the
+benchmarks, so a run needs neither network access nor credentials (the pages are of the current
+season, so pretend it is over with F1_CURRENT_SEASON). That store is saved next to the checkpoint
+(<checkpoint>.store.json) along with it, so interrupted offline runs resume too.
+
+Usage:
+    python backfill.py 2018-2024
+    python backfill.py 2022 2023 --workers 8 --rate 5
+    F1_CURRENT_SEASON=2026 python backfill.py 2025 --fixtures benchmarks/fixtures --checkpoint /tmp/backfill.json
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sys
+import time
+
+from seasons import SeasonError, is_frozen, parse_season, season_collection
+
+logger = logging.getLogger(__name__)
+
+
+class Checkpoint:
+    """
+    Progress of a backfill, kept in a JSON file: {season: {'calendar': bool, 'races': [race_id, ...], 'done': bool}}.
+    The file is rewritten as a whole on every save, to a temporary file that is then moved into place.
+    `before_save`, if given, is called first, e.g. to save an in-memory store the progress refers to.
+    """
+
+    def __init__(self, path, before_save=None):
+        self.path = path
+        self.before_save = before_save
+        try:
+            with open(path) as f:
+                self.seasons = json.load(f)
+        except FileNotFoundError:
+            self.seasons = {}
+
+    def season(self, season):
+        return self.seasons.setdefault(str(season), {'calendar': False, 'races': [], 'done': False})
+
+    def reset(self, season):
+        self.seasons.pop(str(season), None)
+        return self.season(season)
+
+    def save(self):
+        if self.before_save is not None:
+            self.before_save()
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self.seasons, f, indent=2)
+        os.replace(temp_path, self.path)
+
+
+def parse_seasons(values):
+    """Expands arguments like '2021' and '2018-2020' into a sorted list of seasons. Raises SeasonError."""
+    seasons = set()
+    for value in values:
+        first, _, last = value.partition('-')
+        seasons.update(range(parse_season(first), parse_season(last or first) + 1))
+    return sorted(seasons)
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def scrape_chunk(races, with_results):
+    """
+    Scrapes the circuit, sessions and (if `with_results`) session results of `races`.
+    Returns {race_id: {'circuit': ..., 'sessions': [...]}} for the races whose pages all loaded.
+    """
+    from circuits import get_circuits_for_races
+    from results import get_results_for_races
+    from sessions import get_sessions_for_races
+
+    race_urls = [race['link'] for race in races]
+    circuits = get_circuits_for_races(race_urls)
+    sessions = get_sessions_for_races(race_urls)
+
+    if with_results:
+        # The result pages of the whole chunk share the worker pool
+        sessions = get_results_for_races(sessions)
+
+    scraped = {}
+    for race in races:
+        race_url = race['link']
+        if not circuits.get(race_url) or not sessions.get(race_url):
+            logger.warning("Failed to load %s of %s, will retry on the next run", race_url, race.get('season'))
+            continue
+        scraped[race['race_id']] = {'circuit': circuits[race_url], 'sessions': sessions[race_url]}
+    return scraped
+
+
+def backfill_season(season, checkpoint, chunk_size, with_results, force):
+    """Loads one past season, resuming from `checkpoint`. Returns whether the season is complete."""
+    from firebase import get_db
+    from metrics import span
+    from races import get_all_races
+    from update_firestore_data import (
+        commit_in_batches, freeze_season, is_season_frozen, season_metadata_ref, stamp_metadata, update_races
+    )
+
+    progress = checkpoint.reset(season) if force else checkpoint.season(season)
+    if not force and is_season_frozen(season):
+        logger.info("Season %s is already loaded, skipping it.", season)
+        progress['done'] = True
+        checkpoint.save()
+        return True
+
+    start = time.perf_counter()
+    races = [race for race in get_all_races(season) if race.get('link')]
+    if not races:
+        logger.error("No races found for %s", season)
+        return False
+
+    collection_name = season_collection('races', season)
+    collection_ref = get_db().collection(collection_name)
+    if progress['calendar']:
+        # The checkpoint may be ahead of the store (e.g. the collection was deleted since): only trust it
+        # if every race document is still there, else start the season over
+        with span('firestore_read'):
+            stored = {doc.id for doc in collection_ref.list_documents()}
+        if not {str(race['race_id']) for race in races} <= stored:
+            logger.warning("Season %s: stored races are missing, loading the season again.", season)
+            progress = checkpoint.reset(season)
+            # Dropping the metadata (and its content hashes) makes update_races rewrite every race
+            season_metadata_ref(season).delete()
+
+    if not progress['calendar']:
+        update_races(season)
+        progress['calendar'] = True
+        checkpoint.save()
+
+    done = set(progress['races'])
+    pending = [race for race in races if race['race_id'] not in done]
+    logger.info("Season %s: %s races, %s done, %s to load.", season, len(races), len(done), len(pending))
+
+    for chunk in chunks(pending, chunk_size):
+        scraped = scrape_chunk(chunk, with_results)
+        if not scraped:
+            continue
+
+        operations = [
+            lambda batch, doc_ref=collection_ref.document(str(race_id)), fields=fields: batch.update(doc_ref, fields)
+            for race_id, fields in scraped.items()
+        ]
+        operations.append(stamp_metadata(collection_name))
+        commit_in_batches(operations)
+
+        progress['races'] += list(scraped)
+        checkpoint.save()
+        logger.info("Season %s: %s of %s races done.", season, len(progress['races']), len(races))
+
+    if len(progress['races']) < len(races):
+        logger.warning(
+            "Season %s: %s races failed to load, run the backfill again to retry them.",
+            season, len(races) - len(progress['races'])
+        )
+        return False
+
+    freeze_season(season)
+    progress['done'] = True
+    checkpoint.save()
+    logger.info("Loaded season %s in %.1fs.", season, time.perf_counter() - start, extra={'season': season})
+    return True
+
+
+def backfill(seasons, checkpoint, chunk_size, with_results, force):
+    complete = True
+    for season in seasons:
+        if not is_frozen(season):
+            logger.error("Skipping %s: only past seasons are backfilled, the update jobs keep the current one.", season)
+            complete = False
+            continue
+        complete = backfill_season(season, checkpoint, chunk_size, with_results, force) and complete
+    return complete
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('seasons', nargs='+', help="seasons to load, e.g. 2023 or 2018-2022")
+    parser.add_argument('--workers', type=int, default=4, help='pages fetched in parallel')
+    parser.add_argument('--rate', type=float, default=2, help='max requests per second to formula1.com (0 disables)')
+    parser.add_argument('--chunk', type=int, default=10, help='races scraped and written together')
+    parser.add_argument('--checkpoint', default='backfill-checkpoint.json', help='file recording the progress')
+    parser.add_argument('--no-results', action='store_true', help="don't fetch session results")
+    parser.add_argument('--force', action='store_true', help='load seasons again, even if already loaded')
+    parser.add_argument('--fixtures', help='serve pages from this recorded directory and write to an in-memory Firestore')
+    args = parser.parse_args()
+
+    try:
+        seasons = parse_seasons(args.seasons)
+    except SeasonError as e:
+        parser.error(str(e))
+
+    with contextlib.ExitStack() as stack:
+        # Must be set before the scrapers are imported: they read their configuration at import time
+        os.environ.update({'F1_FETCH_WORKERS': str(args.workers), 'F1_HOST_RATE_LIMIT': str(args.rate)})
+        # The scraped pages end up in Firestore, the serving caches on disk have no use for them
+        os.environ.setdefault('F1_DISK_CACHE_DIR', '')
+
+        client = None
+        checkpoint = Checkpoint(args.checkpoint)
+        if args.fixtures:
+            from benchmarks.fake_firestore import install
+            from benchmarks.fixtures import FixtureServer
+
+            if not os.path.isdir(args.fixtures):
+                parser.error(f"No fixture directory {args.fixtures}")
+            server = stack.enter_context(FixtureServer(args.fixtures))
+            os.environ['F1_BASE_URL'] = server.base_url
+            client = install()
+            store_path = f'{args.checkpoint}.store.json'
+            client.load(store_path)
+            checkpoint.before_save = lambda: client.save(store_path)
+
+        from logs import configure_logging
+
+        configure_logging()
+        try:
+            complete = backfill(seasons, checkpoint, args.chunk, not args.no_results, args.force)
+        except KeyboardInterrupt:
+            logger.warning("Interrupted; run the same command again to resume from %s", args.checkpoint)
+            sys.exit(130)
+
+        if client is not None:
+            logger.info("In-memory Firestore: %s reads, %s writes, %s batch commits.", client.reads, client.writes, client.commits)
+
+    sys.exit(0 if complete else 1)
+
+
+if __name__ == '__main__':
+    main()
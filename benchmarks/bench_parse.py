@@ -0,0 +1,95 @@
+"""
+Parse-time microbenchmark over recorded fixture pages (by default, the synthetic pages
+of benchmarks.synthetic_fixtures).
+
+Runs every scraper's parse function over the matching fixture pages, first the way
+pages used to be parsed (html.parser, full tree) and then with the configured parser
+and scoped (SoupStrainer) parsing, and checks both produce the same data.
+
+Usage:
+    python -m benchmarks.bench_parse --repeat 5
+"""
+import argparse
+import os
+import re
+import time
+
+import parsing
+from benchmarks.synthetic_fixtures import ensure_fixtures
+from circuits import parse_circuit
+from drivers import parse_driver_cards, parse_driver_profile
+from races import parse_races
+from results import parse_results_page
+from sessions import parse_race_sessions
+from teams import parse_team_cards, parse_team_profile
+
+# Fixture file name pattern -> (page kind, parse function)
+PAGE_KINDS = [
+    (r'en__drivers\.html$', 'driver list', parse_driver_cards),
+    (r'en__drivers__[^_]+\.html$', 'driver profile', parse_driver_profile),
+    (r'en__teams\.html$', 'team list', parse_team_cards),
+    (r'en__teams__[^_]+\.html$', 'team profile', parse_team_profile),
+    (r'en__racing__\d{4}\.html$', 'calendar', parse_races),
+    (r'en__racing__\d{4}__[^_]+\.html$', 'race page', parse_race_sessions),
+    (r'__circuit\.html$', 'circuit', parse_circuit),
+    (r'__(practice__\d|starting-grid|race-result|sprint-result|sprint-grid)\.html$', 'results', parse_results_page),
+]
+
+
+class FixtureResponse:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.content = f.read()
+        self.text = self.content.decode('utf-8')
+
+
+def load_pages(fixtures_dir):
+    pages = {}
+    for name in sorted(os.listdir(fixtures_dir)):
+        for pattern, kind, parse in PAGE_KINDS:
+            if re.search(pattern, name):
+                pages.setdefault(kind, (parse, []))[1].append(FixtureResponse(os.path.join(fixtures_dir, name)))
+                break
+    return pages
+
+
+def time_parse(parse, responses, repeat, parser, scoped):
+    parsing.PARSER, parsing.SCOPED_PARSING = parser, scoped
+    outputs = [parse(response) for response in responses]
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for response in responses:
+            parse(response)
+    return (time.perf_counter() - start) / repeat, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', help='directory of recorded pages (default: synthetic pages, see benchmarks.synthetic_fixtures)')
+    parser.add_argument('--repeat', type=int, default=5, help='timed passes over the pages')
+    args = parser.parse_args()
+
+    configured = (parsing.PARSER, parsing.SCOPED_PARSING)
+    fixtures = args.fixtures or ensure_fixtures()
+    pages = load_pages(fixtures)
+    if not pages:
+        raise SystemExit(f"No fixture pages found in {fixtures}")
+
+    print(f"{'page kind':<16}{'pages':>6}{'html.parser':>14}{configured[0]:>14}{'speedup':>9}")
+    total_before = total_after = 0.0
+    for kind, (parse, responses) in pages.items():
+        before, expected = time_parse(parse, responses, args.repeat, 'html.parser', False)
+        after, actual = time_parse(parse, responses, args.repeat, *configured)
+        if actual != expected:
+            print(f"WARNING: {kind} pages parse differently with {configured[0]} / scoped parsing")
+
+        total_before += before
+        total_after += after
+        print(f"{kind:<16}{len(responses):>6}{before * 1000:>12.1f}ms{after * 1000:>12.1f}ms{before / after:>8.1f}x")
+
+    print(f"{'total':<16}{'':>6}{total_before * 1000:>12.1f}ms{total_after * 1000:>12.1f}ms{total_before / total_after:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
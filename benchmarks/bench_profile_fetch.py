@@ -0,0 +1,59 @@
+"""
+Compares serial and concurrent profile-page fetching in get_all_drivers() and
+get_all_teams(), replaying recorded pages (by default, the synthetic pages of
+benchmarks.synthetic_fixtures) from a local server with simulated latency.
+
+Usage:
+    python -m benchmarks.bench_profile_fetch --latency 0.15
+"""
+import argparse
+import os
+import time
+
+from benchmarks.fixtures import FixtureServer
+from benchmarks.synthetic_fixtures import ensure_fixtures
+
+
+def run(label, workers):
+    import fetcher
+    import drivers
+    import teams
+
+    fetcher.MAX_WORKERS = workers
+    drivers.clear_cache()
+    teams.clear_cache()
+    fetcher.clear_validators()
+
+    start = time.perf_counter()
+    driver_list = drivers.get_all_drivers()
+    team_list = teams.get_all_teams()
+    elapsed = time.perf_counter() - start
+
+    print(f"{label:<12} workers={workers:<3} drivers={len(driver_list):<3} teams={len(team_list):<3} {elapsed:.3f}s")
+    return elapsed, [d['name'] for d in driver_list], [t['team_name'] for t in team_list]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', help='directory of recorded pages (default: synthetic pages, see benchmarks.synthetic_fixtures)')
+    parser.add_argument('--latency', type=float, default=0.15, help='simulated round-trip time per page, in seconds')
+    parser.add_argument('--workers', type=int, default=8, help='worker count for the concurrent run')
+    args = parser.parse_args()
+
+    with FixtureServer(args.fixtures or ensure_fixtures(), latency=args.latency) as server:
+        # The scrapers read their base URL at import time, so point them at the stub first
+        os.environ['F1_BASE_URL'] = server.base_url
+        os.environ['F1_HOST_RATE_LIMIT'] = '0'
+        os.environ['F1_DISK_CACHE_DIR'] = ''
+
+        serial, serial_drivers, serial_teams = run('serial', 1)
+        concurrent, concurrent_drivers, concurrent_teams = run('concurrent', args.workers)
+
+    if (serial_drivers, serial_teams) != (concurrent_drivers, concurrent_teams):
+        raise SystemExit("Concurrent fetch produced a different driver/team ordering")
+
+    print(f"speedup: {serial / concurrent:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Measures cold-start time: importing the app and serving the first requests in a fresh
+Python process, like a new serverless instance would, against an in-memory Firestore.
+
+Each run starts a new interpreter and reports how long `import app` and each of the first
+requests took, and whether the scraping (bs4) and Firebase (firebase_admin) stacks had been
+imported by then.
+
+Usage:
+    python -m benchmarks.bench_startup --runs 10
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+DEFAULT_PATHS = ['/', '/api/drivers', '/api/races']
+
+# Runs in the child process: prints a JSON line of timings
+CHILD = '''
+import json, os, sys, time
+start = time.perf_counter()
+os.environ['F1_REFRESH_SCHEDULER'] = '0'
+from benchmarks.fake_firestore import install
+client = install()
+for name in ('drivers', 'teams', 'races'):
+    client.collection(name).document('metadata').set({'last_updated': time.time()})
+    client.collection(name).document('1').set({'name': name})
+ready = time.perf_counter()
+import app
+imported = time.perf_counter()
+timings = {'import app': imported - ready}
+test_client = app.app.test_client()
+for path in sys.argv[1:]:
+    before = time.perf_counter()
+    status = test_client.get(path).status_code
+    timings[f'GET {path} ({status})'] = time.perf_counter() - before
+timings['total'] = time.perf_counter() - ready
+print(json.dumps({
+    'timings': timings,
+    'bs4 loaded': 'bs4' in sys.modules,
+    'firebase_admin loaded': 'firebase_admin' in sys.modules
+}))
+'''
+
+
+def run_once(paths):
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD, *paths], capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='number of fresh processes to time')
+    parser.add_argument('paths', nargs='*', default=DEFAULT_PATHS, help='paths requested after startup, in order')
+    args = parser.parse_args()
+
+    runs = [run_once(args.paths) for _ in range(args.runs)]
+
+    for label in runs[0]['timings']:
+        values = [run['timings'][label] * 1000 for run in runs]
+        print(f"{label:<32} median {statistics.median(values):8.1f}ms  min {min(values):8.1f}ms  max {max(values):8.1f}ms")
+    for module in ('bs4 loaded', 'firebase_admin loaded'):
+        print(f"{module:<32} {runs[-1][module]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""
+Offline benchmark suite for the hot paths, run against recorded fixture pages and an
+in-memory Firestore, so it needs neither network access nor credentials. Without --fixtures,
+the synthetic pages of benchmarks.synthetic_fixtures are used.
+
+Three sections:
+  parse      every parse function over the matching fixture pages (see bench_parse)
+  scrapers   get_all_races/drivers/teams, get_race_sessions, get_circuit_info and
+             parse_session_results with cold caches, replaying pages from a local server
+  endpoints  the Flask routes through the test client, on Firestore data seeded by
+             update_all() from the same pages
+
+Each case reports its median and p95/p99 time over --repeat runs, and the peak and
+retained memory allocated by one traced run (tracemalloc); endpoints also report the
+Firestore reads of all their runs. Save a run with --save and
+compare a later one against it with --compare: cases slower (or allocating more) than
+--tolerance relative to the saved run are listed, and the exit status is 1.
+
+Usage:
+    python -m benchmarks.bench_suite --repeat 20 --save baseline.json
+    python -m benchmarks.bench_suite --repeat 20 --compare baseline.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from benchmarks.fake_firestore import install
+from benchmarks.fixtures import FixtureServer, fixture_path
+from benchmarks.synthetic_fixtures import ensure_fixtures
+
+# Routes served from Firestore data; <race_id>, <driver_id> and <team_id> are filled in from the seeded data
+ROUTES = [
+    '/',
+    '/api/races',
+    '/api/races/<race_id>',
+    '/api/races/search?q=grand',
+    '/api/races/<race_id>/sessions',
+    '/api/races/<race_id>/circuit',
+    '/api/races/<race_id>/results',
+    '/api/drivers',
+    '/api/drivers?fields=name,team,driver_points&sort=-driver_points&limit=10',
+    '/api/driver/<driver_id>',
+    '/api/drivers/top3',
+    '/api/drivers/search?q=max',
+    '/api/teams',
+    '/api/teams/<team_id>',
+    '/api/teams/sort',
+    '/api/teams/search?q=red',
+]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def measure(run, repeat, setup=None):
+    """
+    Times `repeat` calls of run() (each after setup(), untimed), then traces the
+    allocations of one more call. Returns the timings in ms and the memory in KiB.
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    run()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'median_ms': statistics.median(timings),
+        'p95_ms': percentile(timings, 0.95),
+        'p99_ms': percentile(timings, 0.99),
+        'peak_kib': (peak - before) / 1024,
+        'retained_kib': (current - before) / 1024
+    }
+
+
+def print_section(title, results):
+    print(f"\n{title}")
+    print(f"{'case':<64}{'median':>10}{'p95':>10}{'p99':>10}{'peak':>12}{'retained':>12}{'reads':>7}")
+    for case, result in results.items():
+        print(
+            f"{case:<64}{result['median_ms']:>8.2f}ms{result['p95_ms']:>8.2f}ms{result['p99_ms']:>8.2f}ms"
+            f"{result['peak_kib']:>9.0f}KiB{result['retained_kib']:>9.0f}KiB{result.get('firestore_reads', ''):>7}"
+        )
+
+
+def run_parse(fixtures_dir, repeat):
+    from benchmarks.bench_parse import load_pages
+
+    results = {}
+    for kind, (parse, responses) in load_pages(fixtures_dir).items():
+        results[f'{kind} ({len(responses)} pages)'] = measure(
+            lambda: [parse(response) for response in responses], repeat
+        )
+    return results
+
+
+def clear_caches():
+    import cache
+    import fetcher
+
+    for entity_cache in cache.caches.values():
+        entity_cache.clear()
+    fetcher.clear_validators()
+
+
+def run_scrapers(fixtures_dir, repeat):
+    from circuits import get_circuit_info
+    from drivers import get_all_drivers
+    from races import get_all_race_urls, get_all_races
+    from results import parse_session_results, session_results_url
+    from sessions import get_race_sessions
+    from teams import get_all_teams
+
+    def recorded(url):
+        return os.path.exists(fixture_path(fixtures_dir, url))
+
+    race_urls = [url for url in get_all_race_urls() if recorded(url)]
+    circuit_urls = [url for url in race_urls if recorded(f'{url}/circuit')]
+    result_urls = [
+        url for url in (
+            session_results_url(race_url, session.get('name'))
+            for race_url in race_urls for session in get_race_sessions(race_url)
+        )
+        if url and recorded(url)
+    ]
+
+    cases = {
+        'get_all_races()': get_all_races,
+        'get_all_drivers()': get_all_drivers,
+        'get_all_teams()': get_all_teams,
+        f'get_race_sessions() x{len(race_urls)} races': lambda: [get_race_sessions(url) for url in race_urls],
+        f'get_circuit_info() x{len(circuit_urls)} races': lambda: [get_circuit_info(url) for url in circuit_urls],
+        f'parse_session_results() x{len(result_urls)} sessions': lambda: [parse_session_results(url) for url in result_urls],
+    }
+    return {case: measure(run, repeat, setup=clear_caches) for case, run in cases.items()}
+
+
+def run_endpoints(client, repeat):
+    import app
+    import update_firestore_data
+
+    update_firestore_data.update_all()
+
+    ids = {
+        '<race_id>': app.fetch_from_firestore('races')[0]['race_id'],
+        '<driver_id>': app.fetch_from_firestore('drivers')[0]['driver_id'],
+        '<team_id>': app.fetch_from_firestore('teams')[0]['team_id'],
+    }
+    test_client = app.app.test_client()
+
+    results = {}
+    for route in ROUTES:
+        path = route
+        for placeholder, value in ids.items():
+            path = path.replace(placeholder, str(value))
+
+        # The first request may load a snapshot or scrape; the timed ones are served warm
+        status = test_client.get(path).status_code
+        client.reset_counters()
+        result = measure(lambda: test_client.get(path, headers={'Accept-Encoding': 'gzip'}), repeat)
+        result['firestore_reads'] = client.reads
+        results[f'GET {path} ({status})'] = result
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Returns a line for every case that got slower or allocates more than `tolerance` over the baseline."""
+    regressions = []
+    for section, cases in results.items():
+        for case, result in cases.items():
+            before = baseline.get(section, {}).get(case)
+            if not before:
+                continue
+            for metric in ('median_ms', 'peak_kib'):
+                if before[metric] > 0 and result[metric] > before[metric] * (1 + tolerance):
+                    regressions.append(
+                        f"{section}: {case}: {metric} {before[metric]:.2f} -> {result[metric]:.2f} "
+                        f"(+{(result[metric] / before[metric] - 1) * 100:.0f}%)"
+                    )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', help='directory of recorded pages (default: synthetic pages, see benchmarks.synthetic_fixtures)')
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs per case')
+    parser.add_argument('--sections', default='parse,scrapers,endpoints', help='comma-separated sections to run')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of a saved run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown/growth over the saved run')
+    args = parser.parse_args()
+
+    if args.fixtures and not os.path.isdir(args.fixtures):
+        raise SystemExit(f"No fixture directory {args.fixtures}; record one with benchmarks.record_fixtures")
+    fixtures = args.fixtures or ensure_fixtures()
+    sections = args.sections.split(',')
+
+    with FixtureServer(fixtures) as server:
+        # Must be set before the scrapers and the app are imported: they read their configuration at import time
+        os.environ.update({
+            'F1_BASE_URL': server.base_url,
+            'F1_REFRESH_SCHEDULER': '0',
+            'F1_HOST_RATE_LIMIT': '0',
+            'F1_DISK_CACHE_DIR': '',
+            'F1_LOG_LEVEL': 'WARNING',
+            'F1_WRITE_BEHIND_DELAY': '3600'
+        })
+        client = install()
+
+        results = {}
+        if 'parse' in sections:
+            results['parse'] = run_parse(fixtures, args.repeat)
+            print_section('parse', results['parse'])
+        if 'scrapers' in sections:
+            results['scrapers'] = run_scrapers(fixtures, args.repeat)
+            print_section('scrapers (cold caches)', results['scrapers'])
+        if 'endpoints' in sections:
+            results['endpoints'] = run_endpoints(client, args.repeat)
+            print_section('endpoints (warm)', results['endpoints'])
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressions over {args.compare}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions over {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
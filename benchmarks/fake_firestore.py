@@ -0,0 +1,299 @@
+"""
+In-memory stand-in for the Firestore client, so the Flask app and the update jobs can run
+in benchmarks without credentials or network access.
+
+Only the calls this project makes are implemented. Reads, writes and batch commits are
+counted (like Firestore bills them: every streamed document is one read), so benchmarks
+can report Firestore costs as well as latencies.
+
+    from benchmarks.fake_firestore import install
+    client = install()   # before the first Firestore access
+"""
+import copy
+import json
+import os
+import threading
+import uuid
+
+from google.api_core.exceptions import NotFound
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+
+def _merge(doc, data):
+    """Applies `data` to the stored `doc` like Firestore's merge/update, including DELETE_FIELD sentinels."""
+    from google.cloud.firestore import DELETE_FIELD
+
+    for field, value in data.items():
+        if value is DELETE_FIELD:
+            doc.pop(field, None)
+        else:
+            doc[field] = copy.deepcopy(value)
+
+
+class DocumentReference:
+    def __init__(self, collection, doc_id):
+        self._collection = collection
+        self._client = collection._client
+        self.id = doc_id
+
+    @property
+    def path(self):
+        return f'{self._collection.name}/{self.id}'
+
+    def get(self):
+        with self._client._lock:
+            self._client.reads += 1
+            return DocumentSnapshot(self, copy.deepcopy(self._collection._docs.get(self.id)))
+
+    def set(self, data, merge=False):
+        with self._client._lock:
+            self._client.writes += 1
+            docs = self._collection._docs
+            if merge:
+                _merge(docs.setdefault(self.id, {}), data)
+            else:
+                docs[self.id] = copy.deepcopy(data)
+        self._client._notify(self)
+
+    def update(self, data):
+        with self._client._lock:
+            if self.id not in self._collection._docs:
+                raise NotFound(f'No document to update: {self.path}')
+            self._client.writes += 1
+            _merge(self._collection._docs[self.id], data)
+        self._client._notify(self)
+
+    def delete(self):
+        with self._client._lock:
+            self._client.writes += 1
+            self._collection._docs.pop(self.id, None)
+        self._client._notify(self)
+
+    def collection(self, name):
+        return self._client.collection(f'{self.path}/{name}')
+
+    def on_snapshot(self, callback):
+        return self._client._listen(self, callback)
+
+
+class Query:
+    def __init__(self, collection, filters=(), limit=None):
+        self._collection = collection
+        self._filters = filters
+        self._limit = limit
+
+    def where(self, field, op, value):
+        if op != '==':
+            raise NotImplementedError(f'Only == filters are supported, not {op}')
+        return Query(self._collection, self._filters + ((field, value),), self._limit)
+
+    def limit(self, count):
+        return Query(self._collection, self._filters, count)
+
+    def stream(self):
+        client = self._collection._client
+        with client._lock:
+            snapshots = [
+                DocumentSnapshot(DocumentReference(self._collection, doc_id), copy.deepcopy(data))
+                for doc_id, data in sorted(self._collection._docs.items())
+                if all(data.get(field) == value for field, value in self._filters)
+            ]
+            if self._limit is not None:
+                snapshots = snapshots[:self._limit]
+            # A query returning nothing is still billed one read
+            client.reads += max(len(snapshots), 1)
+        return iter(snapshots)
+
+    def get(self):
+        return list(self.stream())
+
+
+class CollectionReference(Query):
+    def __init__(self, client, name):
+        self._client = client
+        self.name = name
+        self._docs = {}
+        super().__init__(self)
+
+    def document(self, doc_id=None):
+        return DocumentReference(self, doc_id or uuid.uuid4().hex[:20])
+
+    def add(self, data):
+        doc_ref = self.document()
+        doc_ref.set(data)
+        return None, doc_ref
+
+    def list_documents(self):
+        with self._client._lock:
+            self._client.reads += 1
+            return [DocumentReference(self, doc_id) for doc_id in sorted(self._docs)]
+
+
+class WriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._operations = []
+
+    def set(self, doc_ref, data, merge=False):
+        self._operations.append(lambda: doc_ref.set(data, merge=merge))
+
+    def update(self, doc_ref, data):
+        self._operations.append(lambda: doc_ref.update(data))
+
+    def delete(self, doc_ref):
+        self._operations.append(doc_ref.delete)
+
+    def commit(self):
+        self._client.commits += 1
+        for operation in self._operations:
+            operation()
+        self._operations = []
+
+
+class _Watch:
+    def __init__(self, client, path, callback):
+        self._client = client
+        self.path = path
+        self.callback = callback
+
+    def unsubscribe(self):
+        with self._client._lock:
+            self._client._watches.remove(self)
+
+
+class FakeClient:
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+        self.commits = 0
+        self._collections = {}
+        self._watches = []
+        self._lock = threading.RLock()
+
+    def collection(self, name):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = CollectionReference(self, name)
+            return self._collections[name]
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def reset_counters(self):
+        self.reads = self.writes = self.commits = 0
+
+    def save(self, path):
+        """Writes every document to a JSON file, so a later process can load() them."""
+        with self._lock:
+            data = json.dumps({name: collection._docs for name, collection in self._collections.items() if collection._docs})
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def load(self, path):
+        """Adds the documents saved to `path` by save(), if the file exists."""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            for name, docs in data.items():
+                self.collection(name)._docs.update(docs)
+
+    def _listen(self, doc_ref, callback):
+        watch = _Watch(self, doc_ref.path, callback)
+        with self._lock:
+            self._watches.append(watch)
+        self._notify(doc_ref)
+        return watch
+
+    def _notify(self, doc_ref):
+        with self._lock:
+            watches = [watch for watch in self._watches if watch.path == doc_ref.path]
+            if not watches:
+                return
+            data = copy.deepcopy(doc_ref._collection._docs.get(doc_ref.id))
+        for watch in watches:
+            watch.callback([DocumentSnapshot(doc_ref, data)], [], None)
+
+
+class _AsyncStream:
+    def __init__(self, snapshots):
+        self._snapshots = snapshots
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._snapshots)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class AsyncDocumentReference:
+    def __init__(self, doc_ref):
+        self._doc_ref = doc_ref
+        self.id = doc_ref.id
+
+    async def get(self):
+        return self._doc_ref.get()
+
+    async def set(self, data, merge=False):
+        self._doc_ref.set(data, merge=merge)
+
+    async def update(self, data):
+        self._doc_ref.update(data)
+
+
+class AsyncQuery:
+    def __init__(self, query):
+        self._query = query
+
+    def where(self, field, op, value):
+        return AsyncQuery(self._query.where(field, op, value))
+
+    def limit(self, count):
+        return AsyncQuery(self._query.limit(count))
+
+    def stream(self):
+        return _AsyncStream(self._query.stream())
+
+    async def get(self):
+        return self._query.get()
+
+
+class AsyncCollectionReference(AsyncQuery):
+    def document(self, doc_id=None):
+        return AsyncDocumentReference(self._query.document(doc_id))
+
+
+class FakeAsyncClient:
+    """The firestore_async client, reading and writing the same in-memory data as `client`."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def collection(self, name):
+        return AsyncCollectionReference(self._client.collection(name))
+
+
+def install():
+    """Makes firebase.get_db() hand out a new FakeClient instead of connecting to Firestore, and returns it."""
+    import firebase
+
+    client = FakeClient()
+    firebase.use_clients(client, FakeAsyncClient(client))
+    return client
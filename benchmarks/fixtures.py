@@ -0,0 +1,99 @@
+"""
+Helpers for recording formula1.com pages to disk and replaying them from a
+local HTTP server, so benchmarks can run without touching the live site.
+
+Fixture files are stored flat in a single directory, one file per URL path,
+e.g. /en/drivers/alexander-albon -> en__drivers__alexander-albon.html
+"""
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+from requests.adapters import HTTPAdapter
+
+
+def fixture_name(url):
+    path = unquote(urlsplit(url).path).strip('/')
+    if path.endswith('.html'):
+        path = path[:-len('.html')]
+    return (path.replace('/', '__') or 'index') + '.html'
+
+
+def fixture_path(fixtures_dir, url):
+    return os.path.join(fixtures_dir, fixture_name(url))
+
+
+class RecordingAdapter(HTTPAdapter):
+    """
+    Transport adapter that saves every successful response body into `fixtures_dir`.
+    Requests are sent unconditionally, as a 304 Not Modified has no body to save.
+    """
+
+    def __init__(self, fixtures_dir, **kwargs):
+        super().__init__(**kwargs)
+        self.fixtures_dir = fixtures_dir
+        os.makedirs(fixtures_dir, exist_ok=True)
+
+    def send(self, request, **kwargs):
+        for header in ('If-None-Match', 'If-Modified-Since'):
+            request.headers.pop(header, None)
+        response = super().send(request, **kwargs)
+        if response.status_code == 200:
+            with open(fixture_path(self.fixtures_dir, request.url), 'wb') as f:
+                f.write(response.content)
+        return response
+
+
+class FixtureServer:
+    """
+    Serves recorded fixture pages over HTTP/1.1 (with keep-alive) on localhost.
+    `latency` seconds are added to every response to mimic a round trip to formula1.com.
+    """
+
+    def __init__(self, fixtures_dir, latency=0.0, port=0):
+        fixtures_dir = os.path.abspath(fixtures_dir)
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately; with Nagle's algorithm the body then
+            # waits on the client's delayed ACK, adding ~40ms to every keep-alive response
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                time.sleep(latency)
+                path = fixture_path(fixtures_dir, self.path)
+                if not os.path.exists(path):
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                with open(path, 'rb') as f:
+                    body = f.read()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,229 @@
+"""
+Compares the throughput of the sync (Flask on a fixed thread pool, like gunicorn --threads)
+and async (uvicorn asgi:application) serving modes on requests that have to wait on
+formula1.com, against a local stub of the site and an in-memory Firestore.
+
+Every request asks for the results of a different race whose results aren't stored or cached
+yet, so each one costs an upstream round trip of --latency seconds, and parsing a results page
+of --page-kib KB, the size of the real ones (see benchmarks.synthetic_fixtures). The stub site,
+the server under test and the load generator run in separate processes, so they don't share a GIL.
+
+Usage (needs requirements-async.txt):
+    python -m benchmarks.load_test --races 200 --concurrency 100 --latency 0.5 --threads 8
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+from benchmarks.fake_firestore import install
+from benchmarks.synthetic_fixtures import PAGE_KIB, filler, page_html, results_page
+
+
+class _BackloggedHTTPServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops connections under load, adding seconds of SYN retries
+    request_queue_size = 1024
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    def log(self, type, message, *args):
+        pass
+
+
+class StubSite:
+    """Answers every path with a results page of about `page_kib` KB after `latency` seconds."""
+
+    def __init__(self, latency, page_kib=PAGE_KIB, port=0):
+        body = page_html(results_page(1), filler(page_kib // 2)).encode()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                time.sleep(latency)
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = _BackloggedHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """WSGI server handling requests on a fixed number of threads, like a gunicorn gthread worker."""
+
+    request_queue_size = 1024
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app, handler=_QuietRequestHandler)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def serve_sync(port, threads):
+    from app import app
+
+    PooledWSGIServer('127.0.0.1', port, app, threads).serve_forever()
+
+
+def serve_async(port):
+    import uvicorn
+    from asgi import application
+
+    uvicorn.run(application, host='127.0.0.1', port=port, log_level='warning', backlog=1024)
+
+
+def seed_races(client, race_count, site_url):
+    races = client.collection('races')
+    for race_id in range(1, race_count + 1):
+        races.document(str(race_id)).set({
+            'race_id': race_id,
+            'grand_prix_name': f'Race {race_id}',
+            'link': f'{site_url}/en/racing/2025/race-{race_id}',
+            # A race that has run, so its results are fetched from its result page alone
+            'sessions': [{'name': 'Race', 'date': '16', 'month': 'MAR'}]
+        })
+    races.document('metadata').set({'last_updated': time.time()})
+
+
+def run_server(args):
+    """Server process: the app in `args.role` mode, with an in-memory Firestore holding `args.races` races."""
+    # Must be set before the app is imported: it reads its configuration at import time
+    os.environ.update({
+        'F1_BASE_URL': args.site,
+        'F1_REFRESH_SCHEDULER': '0',
+        'F1_HOST_RATE_LIMIT': '0',
+        'F1_DISK_CACHE_DIR': '',
+        'F1_WRITE_BEHIND_DELAY': '3600'
+    })
+    seed_races(install(), args.races, args.site)
+
+    if args.role == 'sync':
+        serve_sync(args.port, args.threads)
+    else:
+        serve_async(args.port)
+
+
+def spawn(*role_args):
+    return subprocess.Popen([sys.executable, '-m', 'benchmarks.load_test', *role_args])
+
+
+def wait_until_listening(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise SystemExit(f"Nothing listening on port {port} after {timeout}s")
+
+
+def load(base_url, paths, concurrency):
+    """Requests every path from `concurrency` client threads, returning (elapsed, latencies, errors)."""
+    local = threading.local()
+
+    def request(path):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        response = session.get(base_url + path, timeout=300)
+        return time.perf_counter() - start, response.status_code != 200
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(request, paths))
+    elapsed = time.perf_counter() - start
+
+    return elapsed, [latency for latency, _ in outcomes], sum(failed for _, failed in outcomes)
+
+
+def report(label, elapsed, latencies, errors):
+    q = statistics.quantiles(latencies, n=100)
+    print(
+        f"{label:<6} {len(latencies)} requests in {elapsed:.2f}s  {len(latencies) / elapsed:7.1f} req/s  "
+        f"p50={q[49] * 1000:.0f}ms p95={q[94] * 1000:.0f}ms p99={q[98] * 1000:.0f}ms errors={errors}"
+    )
+    return len(latencies) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--races', type=int, default=200, help='number of distinct uncached requests per run')
+    parser.add_argument('--concurrency', type=int, default=100, help='requests in flight at once')
+    parser.add_argument('--latency', type=float, default=0.5, help='simulated formula1.com round-trip time, in seconds')
+    parser.add_argument('--threads', type=int, default=8, help='request threads of the sync server')
+    parser.add_argument('--page-kib', type=int, default=PAGE_KIB, help='size of the stub results page, in KB')
+    # Internal: run one of the child processes
+    parser.add_argument('--role', choices=['stub', 'sync', 'async'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--site', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role == 'stub':
+        StubSite(args.latency, args.page_kib, args.port).server.serve_forever()
+        return
+    if args.role:
+        run_server(args)
+        return
+
+    site_port = free_port()
+    site = spawn(
+        '--role', 'stub', '--port', str(site_port), '--latency', str(args.latency), '--page-kib', str(args.page_kib)
+    )
+    paths = [f'/api/races/{race_id}/results' for race_id in range(1, args.races + 1)]
+    results = {}
+    try:
+        wait_until_listening(site_port)
+        for mode in ('sync', 'async'):
+            port = free_port()
+            server = spawn(
+                '--role', mode, '--port', str(port), '--site', f'http://127.0.0.1:{site_port}',
+                '--races', str(args.races), '--threads', str(args.threads)
+            )
+            try:
+                wait_until_listening(port)
+                results[mode] = report(mode, *load(f'http://127.0.0.1:{port}', paths, args.concurrency))
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        site.terminate()
+        site.wait()
+
+    print(f"async/sync throughput: {results['async'] / results['sync']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
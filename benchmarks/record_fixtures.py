@@ -0,0 +1,52 @@
+"""
+Records the formula1.com pages used by the scrapers into a fixture directory: the driver
+and team lists and profiles, the race calendar, and the race, circuit and result pages of
+every race on it (result pages of sessions that haven't run yet don't exist and are skipped).
+
+Usage (needs network access once):
+    python -m benchmarks.record_fixtures --out benchmarks/fixtures
+"""
+import argparse
+import os
+
+from benchmarks.fixtures import RecordingAdapter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', default='benchmarks/fixtures', help='directory to write fixture pages to')
+    args = parser.parse_args()
+
+    # Must be set before the scrapers are imported: caches or validators loaded from disk would
+    # answer from memory or get 304s, and leave their pages unrecorded
+    os.environ['F1_DISK_CACHE_DIR'] = ''
+
+    import fetcher
+
+    fetcher.get_session().mount('https://', RecordingAdapter(args.out))
+
+    from circuits import get_circuits_for_races
+    from drivers import get_all_drivers
+    from races import get_all_race_urls
+    from results import get_race_results
+    from sessions import get_sessions_for_races
+    from teams import get_all_teams
+
+    print(f"Recorded {len(get_all_drivers())} drivers")
+    print(f"Recorded {len(get_all_teams())} teams")
+
+    race_urls = get_all_race_urls()
+    sessions = get_sessions_for_races(race_urls)
+    print(f"Recorded {len(race_urls)} race pages")
+    circuits = get_circuits_for_races(race_urls)
+    print(f"Recorded {sum(circuit is not None for circuit in circuits.values())} circuit pages")
+
+    result_pages = 0
+    for race_url in race_urls:
+        for session in get_race_results(race_url, sessions[race_url]):
+            result_pages += bool(session.get('results'))
+    print(f"Recorded {result_pages} result pages")
+
+
+if __name__ == '__main__':
+    main()
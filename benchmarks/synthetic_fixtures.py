@@ -0,0 +1,282 @@
+"""
+Generates a synthetic fixture directory: formula1.com-shaped pages for the driver and team
+lists and profiles, a race calendar, and the race, circuit and result pages of its races,
+with the markup the parsers look for. The data is made up, so nothing scraped from the site
+is committed, and the output is the same on every run.
+
+Real pages are a few hundred KB, mostly navigation and the JSON the site hydrates from; every
+page is padded with --page-kib of such markup, so parse and fetch timings stay comparable to
+recorded pages. The benchmarks use this directory when --fixtures isn't given, and generate it
+on first use.
+
+Usage:
+    python -m benchmarks.synthetic_fixtures --out benchmarks/synthetic-fixtures --page-kib 250
+"""
+import argparse
+import json
+import os
+
+from benchmarks.fixtures import fixture_path
+
+SEASON = 2025
+SYNTHETIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'synthetic-fixtures')
+PAGE_KIB = 250
+# Bumped whenever the generated pages change, so directories generated before are regenerated
+VERSION = 1
+VERSION_FILE = '.synthetic-version'
+
+# (first name, last name, team, nationality, points)
+DRIVERS = [
+    ('Max', 'Verstappen', 'Red Bull Racing', 'Netherlands', 321),
+    ('Yuki', 'Tsunoda', 'Red Bull Racing', 'Japan', 30),
+    ('Lando', 'Norris', 'McLaren', 'United Kingdom', 357),
+    ('Oscar', 'Piastri', 'McLaren', 'Australia', 346),
+    ('Charles', 'Leclerc', 'Ferrari', 'Monaco', 210),
+    ('Lewis', 'Hamilton', 'Ferrari', 'United Kingdom', 146),
+    ('George', 'Russell', 'Mercedes', 'United Kingdom', 258),
+    ('Kimi', 'Antonelli', 'Mercedes', 'Italy', 97),
+    ('Alexander', 'Albon', 'Williams', 'Thailand', 73),
+    ('Carlos', 'Sainz', 'Williams', 'Spain', 48),
+    ('Fernando', 'Alonso', 'Aston Martin', 'Spain', 40),
+    ('Lance', 'Stroll', 'Aston Martin', 'Canada', 32),
+    ('Nico', 'Hulkenberg', 'Kick Sauber', 'Germany', 49),
+    ('Gabriel', 'Bortoleto', 'Kick Sauber', 'Brazil', 19),
+    ('Liam', 'Lawson', 'Racing Bulls', 'New Zealand', 38),
+    ('Isack', 'Hadjar', 'Racing Bulls', 'France', 51),
+    ('Esteban', 'Ocon', 'Haas F1 Team', 'France', 32),
+    ('Oliver', 'Bearman', 'Haas F1 Team', 'United Kingdom', 41),
+    ('Pierre', 'Gasly', 'Alpine', 'France', 22),
+    ('Franco', 'Colapinto', 'Alpine', 'Argentina', 0),
+]
+
+# (country, event title, circuit, month, dates); the first RACES_RUN have run, with podiums and result pages
+RACES = [
+    ('Australia', 'FORMULA 1 AUSTRALIAN GRAND PRIX 2025', 'Albert Park', 'MAR', '14-16'),
+    ('China', 'FORMULA 1 CHINESE GRAND PRIX 2025', 'Shanghai International', 'MAR', '21-23'),
+    ('Japan', 'FORMULA 1 JAPANESE GRAND PRIX 2025', 'Suzuka', 'APR', '04-06'),
+    ('Bahrain', 'FORMULA 1 BAHRAIN GRAND PRIX 2025', 'Bahrain International', 'APR', '11-13'),
+    ('Saudi Arabia', 'FORMULA 1 SAUDI ARABIAN GRAND PRIX 2025', 'Jeddah Corniche', 'APR', '18-20'),
+    ('Brazil', 'FORMULA 1 GRANDE PREMIO DE SAO PAULO 2025', 'Interlagos', 'NOV', '07-09'),
+    ('Las Vegas', 'FORMULA 1 LAS VEGAS GRAND PRIX 2025', 'Las Vegas Strip', 'NOV', '20-22'),
+    ('Abu Dhabi', 'FORMULA 1 ABU DHABI GRAND PRIX 2025', 'Yas Marina', 'DEC', '05-07'),
+]
+RACES_RUN = 4
+RESULT_PAGES = ['practice/1', 'practice/2', 'practice/3', 'starting-grid', 'race-result']
+
+# Class lists the race calendar and race page parsers match on
+ROUND_CLASS = 'f1-text font-titillium tracking-normal font-bold non-italic uppercase leading-snug f1-text__micro text-fs-15px text-brand-primary'
+DATES_CLASS = 'f1-heading-wide font-formulaOneWide tracking-normal font-normal non-italic text-fs-18px leading-none normal-case text-brand-black'
+MONTH_CLASS = 'f1-heading-wide font-formulaOneWide tracking-normal font-normal non-italic text-fs-12px leading-none uppercase inline-flex items-center px-xs py-micro rounded-xxs bg-brand-black text-brand-white'
+NAME_CLASS = 'f1-heading tracking-normal text-fs-18px leading-tight normal-case font-bold non-italic f1-heading__body font-formulaOne overflow-hidden'
+LOCATION_CLASS = 'f1-heading tracking-normal text-fs-12px leading-tight normal-case font-normal non-italic f1-heading__body font-formulaOne'
+PODIUM_CODE_CLASS = 'f1-heading tracking-normal text-fs-14px leading-tight normal-case font-bold non-italic f1-heading__body font-formulaOne'
+SESSION_CLASS = 'relative px-xs py-s tablet:p-normal tablet:pl-0 tablet:pr-normal rounded-md flex flex-wrap tablet:flex-nowrap mt-micro items-center bg-white'
+SESSION_NAME_CLASS = 'f1-heading tracking-normal text-fs-18px leading-tight normal-case font-bold non-italic f1-heading__body font-formulaOne block mb-xxs'
+SESSION_DATE_CLASS = 'f1-heading tracking-normal text-fs-18px leading-none normal-case font-normal non-italic f1-heading__body font-formulaOne'
+SESSION_MONTH_CLASS = 'f1-heading tracking-normal text-fs-12px leading-tight uppercase font-normal non-italic f1-heading__body font-formulaOne'
+SESSION_TIME_CLASS = 'f1-text font-titillium tracking-normal font-normal non-italic normal-case leading-none f1-text__micro text-fs-15px'
+
+
+def slugify(name):
+    return name.lower().replace(' ', '-')
+
+
+def filler(kib):
+    """
+    About `kib` KB of page chrome: a navigation menu and the JSON payload the site hydrates
+    from, none of it matched by the parsers.
+    """
+    items = ''.join(
+        f'<li class="nav-item"><span class="nav-link" data-index="{i}">Menu entry {i}</span></li>'
+        for i in range(kib * 4)
+    )
+    payload = json.dumps([
+        {'id': i, 'type': 'article', 'title': f'Story {i}', 'tags': ['news', 'f1', str(SEASON)]}
+        for i in range(kib * 8)
+    ])
+    return (
+        f'<nav class="site-navigation"><ul class="nav-list">{items}</ul></nav>'
+        f'<script id="__NEXT_DATA__" type="application/json">{payload}</script>'
+    )
+
+
+def page_html(body, padding):
+    """A full page around `body`, with `padding` (see filler) before and after it."""
+    return f'<!DOCTYPE html><html lang="en"><head><title>F1</title></head><body>{padding}<main>{body}</main>{padding}</body></html>'
+
+
+def driver_cards():
+    cards = []
+    for first, last, team, nationality, points in DRIVERS:
+        slug = slugify(f'{first} {last}')
+        cards.append(
+            f'<a class="group" href="/en/drivers/{slug}">'
+            f'<div class="f1-driver-name"><p>{first}</p><p>{last}</p></div>'
+            f'<p class="text-greyDark">{team}</p>'
+            f'<div class="flex flex-col gap-micro items-end"><p>{points}</p></div>'
+            f'<img alt="{nationality}" src="/content/flags/{slugify(nationality)}.png"/>'
+            f'<img src="/content/drivers/{slug}.png"/><img src="/content/number-logos/{slug}.png"/></a>'
+        )
+    return ''.join(cards)
+
+
+def driver_profile(first, last, team):
+    return (
+        '<div class="f1-dl"><dl>'
+        '<dt>Team</dt><dd>{team}</dd><dt>Date of birth</dt><dd>01/01/1998</dd>'
+        '<dt>Grands Prix entered</dt><dd>120</dd><dt>Podiums</dt><dd>12</dd>'
+        '</dl></div>'
+        '<div class="f1-driver-bio"><div class="f1-atomic-wysiwyg">'
+        '<p>{first} {last} races for {team}.</p><p>He made his debut in Formula 1 in 2019.</p>'
+        '</div></div>'
+    ).format(first=first, last=last, team=team)
+
+
+def team_cards():
+    teams = {}
+    for first, last, team, _, points in DRIVERS:
+        teams.setdefault(team, []).append((first, last, points))
+
+    cards = []
+    for team, drivers in teams.items():
+        slug = slugify(team)
+        names = ''.join(f'<div class="f1-team-driver-name"><p>{first}</p><p>{last}</p></div>' for first, last, _ in drivers)
+        cards.append(
+            f'<a class="group" href="/en/teams/{slug}"><span>{team}</span>'
+            f'<img src="/content/logo/{slug}.png"/><img src="/content/teams/{slug}-car.png"/>'
+            f'<div class="flex flex-col gap-micro items-end"><p>{sum(points for *_, points in drivers)}</p></div>'
+            f'{names}</a>'
+        )
+    return teams, ''.join(cards)
+
+
+def team_profile(team):
+    return (
+        f'<dl><dt>Full Team Name</dt><dd>{team} Formula 1 Team</dd><dt>Base</dt><dd>Milton Keynes, United Kingdom</dd>'
+        f'<dt>Team Chief</dt><dd>Team Principal</dd><dt>Chassis</dt><dd>RB21</dd><dt>Power Unit</dt><dd>Honda RBPT</dd></dl>'
+        f'<div class="f1-atomic-wysiwyg"><p>{team} entered Formula 1 in 2005.</p></div>'
+    )
+
+
+def calendar_entry(round_number, country, title, month, dates):
+    slug = slugify(country)
+    podium = ''
+    if round_number <= RACES_RUN:
+        podium = '<div class="h-[110px] grid grid-cols-3 gap-micro items-end">' + ''.join(
+            f'<div class="order-{place}"><img class="f1-c-image" alt="{DRIVERS[place - 1][1]}" src="/content/drivers/{place}.png"/>'
+            f'<p class="{PODIUM_CODE_CLASS}">{DRIVERS[place - 1][1][:3].upper()}</p></div>'
+            for place in (1, 2, 3)
+        ) + '</div>'
+    return (
+        f'<a class="outline-offset-4 block" href="/en/racing/{SEASON}/{slug}">'
+        f'<p class="{ROUND_CLASS}">ROUND {round_number}</p><p class="{DATES_CLASS}">{dates}</p>'
+        f'<span class="{MONTH_CLASS}">{month}</span><p class="{NAME_CLASS}">{country}</p>'
+        f'<p class="{LOCATION_CLASS}">{title}</p>'
+        f'<img class="f1-c-image h-[1.625rem]" src="/content/flags/{slug}.png"/>'
+        f'<img class="f1-c-image h-[110px] w-full object-cover" src="/content/circuits/{slug}.png"/>'
+        f'{podium}</a>'
+    )
+
+
+def race_page(month, dates):
+    first_day = int(dates.split('-')[0])
+    sessions = [
+        ('Practice 1', first_day, '12:30 - 13:30'),
+        ('Practice 2', first_day, '16:00 - 17:00'),
+        ('Practice 3', first_day + 1, '12:30 - 13:30'),
+        ('Qualifying', first_day + 1, '16:00 - 17:00'),
+        ('Race', first_day + 2, '15:00'),
+    ]
+    return ''.join(
+        f'<div class="{SESSION_CLASS}"><span class="{SESSION_NAME_CLASS}">{name}</span>'
+        f'<p class="{SESSION_DATE_CLASS}">{day:02d}</p><span class="{SESSION_MONTH_CLASS}">{month}</span>'
+        f'<p class="{SESSION_TIME_CLASS}"><span>{time}</span></p></div>'
+        for name, day, time in sessions
+    )
+
+
+def circuit_page(country, circuit):
+    return (
+        f'<div class="f1-heading__body"><div>{circuit} Circuit</div></div>'
+        f'<img alt="{country} Circuit.png" src="/content/circuits/{slugify(country)}-circuit.png"/>'
+        '<div class="f1-grid"><p class="f1-heading">1996</p><p class="f1-heading">58</p>'
+        '<p class="f1-heading">5.278</p><p class="f1-heading">306.124</p>'
+        '<p class="f1-heading">1:19.813Charles Leclerc(2024)</p></div>'
+        f'<div class="prose"><h2>About {circuit}</h2><p>A fast, flowing circuit.</p>'
+        '<h3>Did you know?</h3><p>The first race here was held in 1996.</p></div>'
+    )
+
+
+def results_page(round_number):
+    # Each race shuffles the order a little, so result pages differ from one another
+    order = DRIVERS[round_number:] + DRIVERS[:round_number]
+    rows = ''.join(
+        f'<tr class="{"bg-brand-white" if position % 2 else "bg-grey-10"}"><td>{position}</td><td>{position + 10}</td>'
+        f'<td>{first} {last}</td><td>{team}</td><td>1:2{position % 10}.{position:03d}</td>'
+        f'<td>+{position * 1.5:.3f}s</td><td>58</td></tr>'
+        for position, (first, last, team, _, _) in enumerate(order, 1)
+    )
+    return f'<table class="f1-table f1-table-with-data w-full"><tbody>{rows}</tbody></table>'
+
+
+def generate(out_dir=SYNTHETIC_DIR, page_kib=PAGE_KIB):
+    """Writes the synthetic pages into `out_dir`. Returns the number of pages written."""
+    os.makedirs(out_dir, exist_ok=True)
+    padding = filler(page_kib // 2)
+    written = 0
+
+    def write(url, body):
+        nonlocal written
+        with open(fixture_path(out_dir, url), 'w', encoding='utf-8') as f:
+            f.write(page_html(body, padding))
+        written += 1
+
+    write('/en/drivers.html', driver_cards())
+    for first, last, team, _, _ in DRIVERS:
+        write(f'/en/drivers/{slugify(f"{first} {last}")}', driver_profile(first, last, team))
+
+    teams, cards = team_cards()
+    write('/en/teams', cards)
+    for team in teams:
+        write(f'/en/teams/{slugify(team)}', team_profile(team))
+
+    calendar = []
+    for round_number, (country, title, circuit, month, dates) in enumerate(RACES, 1):
+        calendar.append(calendar_entry(round_number, country, title, month, dates))
+        race_url = f'/en/racing/{SEASON}/{slugify(country)}'
+        write(race_url, race_page(month, dates))
+        write(f'{race_url}/circuit', circuit_page(country, circuit))
+        if round_number <= RACES_RUN:
+            for result_page in RESULT_PAGES:
+                write(f'{race_url}/{result_page}', results_page(round_number))
+    write(f'/en/racing/{SEASON}', ''.join(calendar))
+
+    with open(os.path.join(out_dir, VERSION_FILE), 'w') as f:
+        f.write(f'{VERSION} {page_kib}\n')
+    return written
+
+
+def ensure_fixtures(out_dir=SYNTHETIC_DIR, page_kib=PAGE_KIB):
+    """Returns `out_dir`, generating the synthetic pages into it first if they are missing or out of date."""
+    try:
+        with open(os.path.join(out_dir, VERSION_FILE)) as f:
+            current = f.read().strip() == f'{VERSION} {page_kib}'
+    except FileNotFoundError:
+        current = False
+    if not current:
+        generate(out_dir, page_kib)
+    return out_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', default=SYNTHETIC_DIR, help='directory to write the pages to')
+    parser.add_argument('--page-kib', type=int, default=PAGE_KIB, help='approximate size of every page, in KB')
+    args = parser.parse_args()
+
+    written = generate(args.out, args.page_kib)
+    print(f"Wrote {written} pages to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,333 @@
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+
+from cachetools import Cache, LRUCache
+
+from diskstore import DISK_CACHE_DIR, DiskStore
+
+logger = logging.getLogger(__name__)
+
+# All caches by name, so their counters can be reported together
+caches = {}
+
+
+def ttl_for(name, default):
+    """TTL in seconds for the `name` cache, overridable with F1_CACHE_TTL_<NAME>."""
+    return float(os.getenv(f'F1_CACHE_TTL_{name.upper()}', default))
+
+
+class _CountingLRUCache(LRUCache):
+    def __init__(self, maxsize, on_evict):
+        super().__init__(maxsize)
+        self._on_evict = on_evict
+
+    def popitem(self):
+        item = super().popitem()
+        self._on_evict()
+        return item
+
+
+class _Flight:
+    """A load in progress, which concurrent callers for the same key wait on (from threads or coroutines)."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self._lock = threading.Lock()
+        self._async_waiters = []
+
+    def finish(self):
+        with self._lock:
+            self.done.set()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def _result(self):
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+    def wait(self):
+        self.done.wait()
+        return self._result()
+
+    async def wait_async(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            pending = not self.done.is_set()
+            if pending:
+                self._async_waiters.append((loop, future))
+        if pending:
+            await future
+        return self._result()
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class EntityCache:
+    """
+    Size-bounded LRU cache whose entries go stale `ttl` seconds after they were loaded.
+
+    A stale entry keeps being served while a single background thread reloads it
+    (stale-while-revalidate), so only the first request after a cold start waits on a scrape.
+    Loads of a missing key are single-flight: concurrent callers wait for the one load
+    in progress instead of starting their own.
+    Empty results are not cached, so a failed scrape is retried on the next request.
+
+    With `persist`, entries are also kept on disk (see diskstore.DiskStore) and the cache is
+    warmed from there on first use, entries keeping the age they had when saved: a restarted
+    process serves them at once, and reloads the stale ones in the background as usual.
+    encode(value) and decode(stored) convert values to and from msgpack-able data.
+    """
+
+    def __init__(self, name, ttl, maxsize=1, persist=False, encode=None, decode=None):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._inflight = {}
+        self._tasks = set()
+        self._entries = self._new_store()
+        self._encode = encode or (lambda value: value)
+        self._decode = decode or (lambda stored: stored)
+        self._disk = DiskStore(name, self._disk_entries) if persist and DISK_CACHE_DIR else None
+        self._warmed = self._disk is None
+        caches[name] = self
+
+    def _new_store(self):
+        return _CountingLRUCache(self.maxsize, self._count_eviction)
+
+    def _count_eviction(self):
+        self.evictions += 1
+
+    def _warm(self):
+        """Loads the entries saved on disk, the first time the cache is used. Call with the lock held."""
+        self._warmed = True
+        try:
+            stored = self._disk.load()
+            now, wall_now = time.monotonic(), time.time()
+            for key, (value, saved_at) in stored.items():
+                if key not in self._entries:
+                    self._entries[key] = (self._decode(value), now - max(wall_now - saved_at, 0))
+        except Exception:
+            logger.exception("Failed to warm the %s cache from disk", self.name)
+
+    def _disk_entries(self):
+        with self._lock:
+            # Cache.__getitem__ reads an entry without marking it as recently used
+            entries = [(key, Cache.__getitem__(self._entries, key)) for key in self._entries]
+        now, wall_now = time.monotonic(), time.time()
+        return {key: [self._encode(value), wall_now - (now - loaded_at)] for key, (value, loaded_at) in entries}
+
+    def _lookup(self, key):
+        """Returns (entry, revalidate): the cached (value, loaded_at) or None, and whether the caller should reload it."""
+        with self._lock:
+            if not self._warmed:
+                self._warm()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+
+            if time.monotonic() - entry[1] < self.ttl:
+                self.hits += 1
+                return entry, False
+
+            self.stale_hits += 1
+            revalidate = key not in self._refreshing
+            if revalidate:
+                self._refreshing.add(key)
+            return entry, revalidate
+
+    def get(self, key, loader):
+        entry, revalidate = self._lookup(key)
+        if entry is None:
+            return self._load(key, loader)
+
+        if revalidate:
+            self._start_revalidation([key], lambda keys: [loader()])
+        return entry[0]
+
+    async def get_async(self, key, loader):
+        """Like get(), with `loader` returning an awaitable. Misses share loads with concurrent get() calls."""
+        entry, revalidate = self._lookup(key)
+        if entry is None:
+            return await self._load_async(key, loader)
+
+        if revalidate:
+            # Keep a reference, so the task isn't garbage collected while it runs
+            task = asyncio.get_running_loop().create_task(self._revalidate_async(key, loader))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return entry[0]
+
+    def get_many(self, keys, load_many):
+        """
+        Like get() for several keys at once.
+        All missing keys are loaded with a single load_many(missing_keys) call, which must
+        return their values in the same order. Returns the values in the order of `keys`.
+        """
+        values = {}
+        missing = []
+        stale = []
+        with self._lock:
+            if not self._warmed:
+                self._warm()
+            now = time.monotonic()
+            for key in keys:
+                if key in values or key in missing:
+                    continue
+
+                entry = self._entries.get(key)
+                if entry is None:
+                    self.misses += 1
+                    missing.append(key)
+                    continue
+
+                value, loaded_at = entry
+                values[key] = value
+                if now - loaded_at < self.ttl:
+                    self.hits += 1
+                else:
+                    self.stale_hits += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        stale.append(key)
+
+        if stale:
+            self._start_revalidation(stale, load_many)
+
+        if missing:
+            for key, value in zip(missing, load_many(missing)):
+                values[key] = value
+                self.set(key, value)
+
+        return [values.get(key) for key in keys]
+
+    def _join_flight(self, key):
+        """Returns (flight, leader): the load of `key` in progress, and whether the caller has to run it."""
+        with self._lock:
+            flight = self._inflight.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._inflight[key] = _Flight()
+            return flight, True
+
+    def _land(self, key, flight):
+        with self._lock:
+            del self._inflight[key]
+        flight.finish()
+
+    def _load(self, key, loader):
+        flight, leader = self._join_flight(key)
+        if not leader:
+            return flight.wait()
+
+        try:
+            flight.value = loader()
+            self.set(key, flight.value)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+        return flight.value
+
+    async def _load_async(self, key, loader):
+        flight, leader = self._join_flight(key)
+        if not leader:
+            return await flight.wait_async()
+
+        try:
+            flight.value = await loader()
+            self.set(key, flight.value)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+        return flight.value
+
+    def refresh(self, key, loader):
+        """Reloads `key` now regardless of its age, sharing the load with any concurrent miss."""
+        return self._load(key, loader)
+
+    def refresh_many(self, keys, load_many):
+        """Reloads all `keys` now with one load_many(keys) call."""
+        keys = list(keys)
+        values = load_many(keys)
+        for key, value in zip(keys, values):
+            self.set(key, value)
+        return values
+
+    def _start_revalidation(self, keys, load_many):
+        threading.Thread(target=self._revalidate, args=(keys, load_many), daemon=True).start()
+
+    def _revalidate(self, keys, load_many):
+        try:
+            for key, value in zip(keys, load_many(keys)):
+                self.set(key, value)
+        except Exception:
+            logger.exception("Failed to refresh %s cache entries %r", self.name, keys)
+        finally:
+            with self._lock:
+                self._refreshing.difference_update(keys)
+
+    async def _revalidate_async(self, key, loader):
+        try:
+            self.set(key, await loader())
+        except Exception:
+            logger.exception("Failed to refresh %s cache entry %r", self.name, key)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def set(self, key, value):
+        if not value:
+            return
+        with self._lock:
+            if not self._warmed:
+                self._warm()
+            self._entries[key] = (value, time.monotonic())
+        if self._disk is not None:
+            self._disk.mark_dirty()
+
+    def clear(self):
+        with self._lock:
+            self._entries = self._new_store()
+            self._warmed = True
+        if self._disk is not None:
+            self._disk.mark_dirty()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        return {
+            'name': self.name,
+            'size': size,
+            'maxsize': self.maxsize,
+            'ttl': None if math.isinf(self.ttl) else self.ttl,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+def cache_stats():
+    return [cache.stats() for cache in caches.values()]
@@ -0,0 +1,144 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+# How often data is refreshed in each phase of the calendar, in seconds
+INTERVALS = {
+    'live': 5 * 60,               # a session is running or has just finished
+    'race_weekend': 30 * 60,      # between sessions of a race weekend
+    'off_week': 6 * 60 * 60       # between race weekends
+}
+
+# A session counts as live from shortly before its start until results and standings have settled
+LIVE_LEAD = timedelta(minutes=15)
+LIVE_TAIL = timedelta(hours=3)
+# Race weekends are widened by a day on each side, for travel-day news and post-race penalties
+WEEKEND_MARGIN = timedelta(days=1)
+# Assumed length of a session whose end time isn't listed (the race itself)
+DEFAULT_SESSION_LENGTH = timedelta(hours=2)
+
+
+def _season(race):
+    match = re.search(r'/racing/(\d{4})', race.get('link') or race.get('url') or '')
+    return int(match.group(1)) if match else None
+
+
+def _day(year, month, day):
+    try:
+        month_number = datetime.strptime(month.strip()[:3].title(), '%b').month
+        return datetime(year, month_number, int(day), tzinfo=timezone.utc)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _clock(value):
+    match = re.match(r'^(\d{1,2}):(\d{2})$', (value or '').strip())
+    return timedelta(hours=int(match.group(1)), minutes=int(match.group(2))) if match else None
+
+
+def session_window(session, year):
+    """
+    Returns the (start, end) UTC datetimes of a scraped session, or None if its date can't be read.
+    formula1.com lists session times in UTC. Sessions that have already run show no times,
+    in which case the whole day is used.
+    """
+    day = _day(year, session.get('month'), (session.get('date') or '').split('-')[0])
+    if day is None:
+        return None
+
+    start = _clock(session.get('start_time'))
+    if start is None:
+        return day, day + timedelta(days=1)
+
+    end = _clock(session.get('end_time'))
+    if end is None:
+        return day + start, day + start + DEFAULT_SESSION_LENGTH
+    if end < start:
+        end += timedelta(days=1)
+    return day + start, day + end
+
+
+def session_settled(session, race_url, now=None):
+    """Whether a session of the race at `race_url` ended over LIVE_TAIL ago, so its results are final."""
+    now = now or datetime.now(timezone.utc)
+    year = _season({'link': race_url})
+    window = session_window(session, year) if year else None
+    return window is not None and window[1] + LIVE_TAIL <= now
+
+
+def _race_window(race, year):
+    # Falls back to the calendar card's "14-16" / "MAR" when a race has no sessions yet
+    days = (race.get('date_range') or '').split('-')
+    first = _day(year, race.get('month'), days[0])
+    last = _day(year, race.get('month'), days[-1])
+    if first is None or last is None or last < first:
+        return None
+    return first, last + timedelta(days=1)
+
+
+def calendar_windows(races):
+    """Returns (session_windows, weekend_windows) for every race that has usable dates."""
+    sessions = []
+    weekends = []
+    for race in races:
+        year = _season(race)
+        if year is None:
+            continue
+
+        windows = [w for w in (session_window(s, year) for s in race.get('sessions') or []) if w]
+        sessions.extend(windows)
+
+        if windows:
+            weekend = min(start for start, _ in windows), max(end for _, end in windows)
+        else:
+            weekend = _race_window(race, year)
+        if weekend:
+            weekends.append((weekend[0] - WEEKEND_MARGIN, weekend[1] + WEEKEND_MARGIN))
+
+    return sessions, weekends
+
+
+def current_phase(races, now=None):
+    """Returns 'live', 'race_weekend' or 'off_week' for `now` (default: the current UTC time)."""
+    now = now or datetime.now(timezone.utc)
+    sessions, weekends = calendar_windows(races)
+
+    if any(start - LIVE_LEAD <= now <= end + LIVE_TAIL for start, end in sessions):
+        return 'live'
+    if any(start <= now <= end for start, end in weekends):
+        return 'race_weekend'
+    return 'off_week'
+
+
+def next_session_start(races, now=None):
+    now = now or datetime.now(timezone.utc)
+    sessions, _ = calendar_windows(races)
+    upcoming = [start for start, _ in sessions if start > now]
+    return min(upcoming) if upcoming else None
+
+
+def next_refresh_time(races, last_refresh, now=None, min_interval=0):
+    """
+    Returns when data last refreshed at `last_refresh` (None if never) should next be refreshed.
+
+    The wait is the interval of the current phase (at least `min_interval` seconds), but never
+    runs past the start of the next live session or race weekend, so the first refresh of a
+    busier phase isn't held back by the long wait of a quiet one.
+    """
+    now = now or datetime.now(timezone.utc)
+    if last_refresh is None:
+        return now
+
+    interval = max(INTERVALS[current_phase(races, now)], min_interval)
+    due = last_refresh + timedelta(seconds=interval)
+
+    sessions, weekends = calendar_windows(races)
+    boundaries = [start - LIVE_LEAD for start, _ in sessions] + [start for start, _ in weekends]
+    upcoming = [boundary for boundary in boundaries if last_refresh < boundary < due]
+    if upcoming:
+        due = min(upcoming)
+    return due
+
+
+def current_interval(races, now=None, min_interval=0):
+    """Interval in seconds of the current phase, for fixed-tick schedulers."""
+    return max(INTERVALS[current_phase(races, now)], min_interval)
@@ -1,19 +1,41 @@
-import requests
-from bs4 import BeautifulSoup
+from cache import EntityCache, ttl_for
+from fetcher import fetch_all, fetch_parsed
+from parsing import any_of, make_soup, strainer
 from races import get_all_race_urls
 import re
 
-cached_circuits = {}
+# One entry per circuit page; circuit facts barely change during a season
+cache = EntityCache('circuits', ttl=ttl_for('circuits', 86400), maxsize=64, persist=True)
+
+# Only the name, map, facts and description of a circuit page
+CIRCUIT_PAGE = any_of(
+    strainer(None, ['f1-heading__body', 'f1-grid', 'prose']),
+    strainer('img', alt=re.compile(r'Circuit\.png$'))
+)
 
 def get_circuit_info(circuit_url):
     circuit_url = f"{circuit_url}/circuit"
-    global cached_circuits
-    if circuit_url in cached_circuits:
-        return cached_circuits[circuit_url]
+    return cache.get(circuit_url, lambda: fetch_parsed(circuit_url, parse_circuit))
+
+def get_circuits_for_races(race_urls):
+    """
+    Returns a {race_url: circuit} dict for every URL in `race_urls`.
+    Circuit pages that aren't cached yet are fetched in parallel; pages that fail to load map to None.
+    """
+    race_urls = list(race_urls)
+    circuit_urls = [f"{race_url}/circuit" for race_url in race_urls]
+    circuits = cache.get_many(circuit_urls, lambda missing: fetch_all(missing, parse_circuit))
+    return dict(zip(race_urls, circuits))
+
+def refresh_circuits_for_races(race_urls):
+    """Like get_circuits_for_races, re-scraping every circuit page instead of reading cached circuits."""
+    race_urls = list(dict.fromkeys(race_urls))
+    circuit_urls = [f"{race_url}/circuit" for race_url in race_urls]
+    circuits = cache.refresh_many(circuit_urls, lambda urls: fetch_all(urls, parse_circuit))
+    return dict(zip(race_urls, circuits))
 
-    headers = {'User-Agent': 'Mozilla/5.0'}
-    response = requests.get(circuit_url, headers=headers)
-    soup = BeautifulSoup(response.content, 'html.parser')
+def parse_circuit(response):
+    soup = make_soup(response.content, CIRCUIT_PAGE)
 
     circuit = {}
 
@@ -53,8 +75,6 @@ def get_circuit_info(circuit_url):
 
         circuit['details'] = sub_info
 
-    # Cache result
-    cached_circuits[circuit_url] = circuit
     return circuit
 
 def process_lap_record(lap_record_str):
@@ -74,5 +94,4 @@ def process_lap_record(lap_record_str):
         return None, None, None
 
 def clear_cache():
-    global cached_circuits
-    cached_circuits = {}
+    cache.clear()
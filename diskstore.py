@@ -0,0 +1,94 @@
+import atexit
+import functools
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+import threading
+
+import msgpack
+
+logger = logging.getLogger(__name__)
+
+# Directory of the cache files; set F1_DISK_CACHE_DIR to an empty value to keep caches in memory only.
+# The default is under the temp directory, the only writable place on Vercel.
+DISK_CACHE_DIR = os.getenv('F1_DISK_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'f1-api-cache'))
+# Seconds between the first change to a cache and the rewrite of its file, batching changes made meanwhile
+FLUSH_DELAY = float(os.getenv('F1_DISK_CACHE_FLUSH_DELAY', '1'))
+# Bumped whenever the layout of stored values changes, so files written by older code are ignored
+FORMAT_VERSION = 1
+
+
+@functools.cache
+def code_version():
+    """
+    Hash of the app's modules. Stored values are parsed pages and entities built from them, so
+    files written by other code (e.g. before a deploy that changed a parser) are ignored too.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.blake2b(digest_size=16)
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.py'):
+            with open(os.path.join(directory, name), 'rb') as f:
+                digest.update(name.encode() + b'\0' + f.read())
+    return digest.hexdigest()
+
+
+class DiskStore:
+    """
+    Keeps the entries of one in-memory cache in a msgpack file, so they survive process restarts.
+
+    The file is read with a memory-mapped buffer and holds {key: [value, saved_at]}, `saved_at`
+    being wall-clock time, and is only read back by the code that wrote it (see code_version). It is rewritten as a whole from collect(), `FLUSH_DELAY` seconds after
+    mark_dirty() and at exit, to a temporary file that is then moved into place, so readers
+    (including other worker processes) never see a partially written file.
+    """
+
+    def __init__(self, name, collect, directory=None):
+        self.name = name
+        self.path = os.path.join(directory or DISK_CACHE_DIR, f'{name}.msgpack')
+        self.collect = collect
+        self._lock = threading.Lock()
+        self._timer = None
+        atexit.register(self.flush)
+
+    def load(self):
+        """Returns the stored {key: (value, saved_at)}, or {} if there is no usable file."""
+        try:
+            with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                stored = msgpack.unpackb(data)
+        except (FileNotFoundError, ValueError):
+            # No file yet, or an empty one (mmap can't map zero bytes)
+            return {}
+        except Exception as e:
+            logger.error("Ignoring unreadable %s cache file %s: %s", self.name, self.path, e)
+            return {}
+
+        if not isinstance(stored, dict) or (stored.get('version'), stored.get('code')) != (FORMAT_VERSION, code_version()):
+            return {}
+        return {key: (value, saved_at) for key, (value, saved_at) in stored['entries'].items()}
+
+    def mark_dirty(self):
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(FLUSH_DELAY, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            if self._timer is None:
+                return
+            self._timer.cancel()
+            self._timer = None
+
+        try:
+            data = msgpack.packb({'version': FORMAT_VERSION, 'code': code_version(), 'entries': self.collect()})
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix=f'.{self.name}-')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, self.path)
+        except Exception:
+            logger.exception("Failed to write the %s cache file %s", self.name, self.path)
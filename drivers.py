@@ -1,22 +1,23 @@
-import requests
-from bs4 import BeautifulSoup
-import traceback
+import logging
+from cache import EntityCache, ttl_for
+from fetcher import BASE_URL, fetch_all, fetch_parsed
+from indexes import build_driver_index
+from parsing import make_soup, strainer
 
-cached_drivers = []
+logger = logging.getLogger(__name__)
 
-def get_all_drivers():
-    global cached_drivers
-    if cached_drivers:
-        return cached_drivers
+cache = EntityCache('drivers', ttl=ttl_for('drivers', 1800),
+                    persist=True, encode=lambda index: index.records, decode=build_driver_index)
+
+# Only the parts of the pages the parsers below look at
+DRIVER_CARDS = strainer('a', 'group')
+DRIVER_PROFILE = strainer('div', ['f1-dl', 'f1-driver-bio'])
 
-    base_url = "https://www.formula1.com"
-    url = f"{base_url}/en/drivers.html"
-    headers = {'User-Agent': 'Mozilla/5.0'}
-    response = requests.get(url, headers=headers)
-    soup = BeautifulSoup(response.text, 'html.parser')
+def parse_driver_cards(response):
+    soup = make_soup(response.text, DRIVER_CARDS)
 
     driver_cards = soup.select('a.group')
-    drivers = []
+    cards = []
 
     for idx, card in enumerate(driver_cards, start=1):
         try:
@@ -29,25 +30,9 @@ def get_all_drivers():
             nationality = card.select_one('img[alt][src*="flags"]')['alt']
             driver_image = card.select_one('img[src*="drivers"]')['src']
             number_logo = card.select_one('img[src*="number-logos"]')['src']
-            profile_url = base_url + card['href']
-
-            profile_response = requests.get(profile_url, headers=headers)
-            profile_soup = BeautifulSoup(profile_response.text, 'html.parser')
-
-            details = {}
-            rows = profile_soup.select('div.f1-dl dl > dt')
-            for dt in rows:
-                label = dt.text.strip()
-                dd = dt.find_next_sibling('dd')
-                if dd:
-                    value = dd.text.strip()
-                    details[label] = value
+            profile_url = BASE_URL + card['href']
 
-            bio_section = profile_soup.select('div.f1-driver-bio .f1-atomic-wysiwyg p')
-            bio_paragraphs = [p.text.strip() for p in bio_section]
-            biography = "\n".join(bio_paragraphs)
-
-            driver_data = {
+            cards.append({
                 'driver_id': idx,
                 'name': full_name,
                 'team': team,
@@ -55,49 +40,67 @@ def get_all_drivers():
                 'nationality': nationality,
                 'image': driver_image,
                 'number_logo': number_logo,
-                'profile_url': profile_url,
-                'profile_data': details,
-                'biography': biography
-            }
+                'profile_url': profile_url
+            })
+
+        except Exception:
+            logger.exception("Skipping driver card #%s", idx)
+            continue
+
+    return cards
 
-            drivers.append(driver_data)
+def parse_driver_profile(response):
+    profile_soup = make_soup(response.text, DRIVER_PROFILE)
 
-        except Exception as e:
-            print(f"\n[ERROR] Skipping driver card #{idx} due to error:\n{e}")
-            traceback.print_exc()
+    details = {}
+    rows = profile_soup.select('div.f1-dl dl > dt')
+    for dt in rows:
+        label = dt.text.strip()
+        dd = dt.find_next_sibling('dd')
+        if dd:
+            value = dd.text.strip()
+            details[label] = value
+
+    bio_section = profile_soup.select('div.f1-driver-bio .f1-atomic-wysiwyg p')
+    bio_paragraphs = [p.text.strip() for p in bio_section]
+    biography = "\n".join(bio_paragraphs)
+
+    return details, biography
+
+def scrape_drivers():
+    # Parsed pages may be handed back again on a 304, so build new dicts instead of mutating them
+    cards = fetch_parsed(f"{BASE_URL}/en/drivers.html", parse_driver_cards)
+
+    # Profile pages are independent of each other, so fetch them concurrently
+    profiles = fetch_all((card['profile_url'] for card in cards), parse_driver_profile)
+    drivers = []
+
+    for card, profile in zip(cards, profiles):
+        if profile is None:
+            logger.error("Skipping driver card #%s: profile page unavailable", card['driver_id'])
             continue
 
+        details, biography = profile
+        drivers.append(dict(card, profile_data=details, biography=biography))
+
     drivers_sorted = sorted(drivers, key=lambda d: d['name'].split()[-1].lower())
 
     for idx, driver in enumerate(drivers_sorted, start=1):
         driver['driver_id'] = idx
 
-    cached_drivers = drivers_sorted
     return drivers_sorted
 
-def get_driver_by_id(driver_id):
-    drivers = get_all_drivers()
-    return next((d for d in drivers if d['driver_id'] == driver_id), None)
+def load_driver_index():
+    return build_driver_index(scrape_drivers())
 
-def get_drivers_by_team(team_name):
-    drivers = get_all_drivers()
-    return [d for d in drivers if d['team'].lower() == team_name.lower()]
+def get_driver_index():
+    return cache.get('drivers', load_driver_index)
 
-def get_top_drivers(n=3):
-    drivers = get_all_drivers()
-    return sorted(drivers, key=lambda d: d['driver_points'], reverse=True)[:n]
+def refresh_drivers():
+    return cache.refresh('drivers', load_driver_index)
 
-def get_drivers_sorted_by_points():
-    return sorted(get_all_drivers(), key=lambda d: d['driver_points'], reverse=True)
-
-def search_drivers(query):
-    query = query.lower()
-    matches = []
-    for d in get_all_drivers():
-        if query in d['name'].lower() or query in d['team'].lower() or query in d['nationality'].lower():
-            matches.append(d)
-    return matches
+def get_all_drivers():
+    return get_driver_index().records
 
 def clear_cache():
-    global cached_drivers
-    cached_drivers = []
+    cache.clear()
@@ -0,0 +1,272 @@
+import asyncio
+import contextvars
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from cachetools import Cache, LRUCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from diskstore import DISK_CACHE_DIR, DiskStore
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = os.getenv('F1_BASE_URL', 'https://www.formula1.com').rstrip('/')
+HEADERS = {'User-Agent': 'Mozilla/5.0'}
+
+# Number of pages fetched in parallel by fetch_all()
+MAX_WORKERS = int(os.getenv('F1_FETCH_WORKERS', '8'))
+# Maximum number of requests started per second against a single host (0 disables the limit)
+HOST_RATE_LIMIT = float(os.getenv('F1_HOST_RATE_LIMIT', '10'))
+# Seconds to wait for a connection / for the response body
+FETCH_TIMEOUT = float(os.getenv('F1_FETCH_TIMEOUT', '10'))
+# Retries for connection errors and 429/5xx responses, with exponential backoff
+FETCH_RETRIES = int(os.getenv('F1_FETCH_RETRIES', '3'))
+# Number of URLs whose ETag/Last-Modified validators, content hash and parsed result are remembered
+VALIDATOR_CACHE_SIZE = int(os.getenv('F1_VALIDATOR_CACHE_SIZE', '2048'))
+
+
+class HostRateLimiter:
+    """
+    Spaces out requests so that no more than `rate` requests per second
+    are started against the same host, across all worker threads.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def _reserve(self, url):
+        """Books the next free slot for the host of `url`, returning how long to wait for it."""
+        if self.rate <= 0:
+            return 0
+
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + 1.0 / self.rate
+        return slot - now
+
+    def wait(self, url):
+        delay = self._reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self, url):
+        delay = self._reserve(url)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+rate_limiter = HostRateLimiter(HOST_RATE_LIMIT)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Returns the process-wide requests.Session, keeping connections alive between fetches."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            retries = Retry(
+                total=FETCH_RETRIES,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(['GET']),
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(MAX_WORKERS, 1), max_retries=retries)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+# url -> (etag, last_modified, content hash, parsed result of the last 200 response)
+_validators = LRUCache(maxsize=VALIDATOR_CACHE_SIZE)
+_validators_lock = threading.Lock()
+
+
+def _saved_validators():
+    saved_at = time.time()
+    with _validators_lock:
+        # Cache.__getitem__ reads an entry without marking it as recently used
+        return {url: [list(Cache.__getitem__(_validators, url)), saved_at] for url in _validators}
+
+
+# Kept on disk too, so a restarted process still sends conditional requests and skips re-parsing unchanged pages
+_validators_store = DiskStore('pages', _saved_validators) if DISK_CACHE_DIR else None
+_validators_warmed = _validators_store is None
+
+
+def _warm_validators():
+    global _validators_warmed
+    stored = _validators_store.load()
+    with _validators_lock:
+        if not _validators_warmed:
+            for url, (entry, _) in stored.items():
+                _validators.setdefault(url, tuple(entry))
+            _validators_warmed = True
+
+
+def fetch(url, headers=None):
+    rate_limiter.wait(url)
+    with span('fetch'):
+        return get_session().get(url, headers=headers, timeout=FETCH_TIMEOUT)
+
+
+def _conditional_headers(url):
+    """Returns (previous validators entry, request headers) for a conditional GET of `url`."""
+    if not _validators_warmed:
+        _warm_validators()
+    with _validators_lock:
+        previous = _validators.get(url)
+
+    headers = {}
+    if previous:
+        etag, last_modified, _, _ = previous
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+    return previous, headers
+
+
+def _content_hash(response):
+    return hashlib.blake2b(response.content, digest_size=16).hexdigest()
+
+
+def _parse_changed(url, previous, response, parse):
+    """
+    Returns parse(response), or the previous parsed result if the page content is unchanged
+    (formula1.com mostly answers 200 with the same page rather than 304), and remembers it.
+    """
+    content_hash = _content_hash(response)
+    if previous and previous[2] == content_hash:
+        parsed = previous[3]
+    else:
+        with span('parse'):
+            parsed = parse(response)
+
+    with _validators_lock:
+        _validators[url] = (response.headers.get('ETag'), response.headers.get('Last-Modified'), content_hash, parsed)
+    if _validators_store is not None:
+        _validators_store.mark_dirty()
+    return parsed
+
+
+def fetch_parsed(url, parse):
+    """
+    Conditional GET of `url`, returning parse(response).
+    The ETag/Last-Modified validators and content hash of each 200 response are remembered
+    together with its parsed result, so a later 304 Not Modified, or a 200 with the same
+    content, returns that result without re-parsing.
+    """
+    previous, headers = _conditional_headers(url)
+
+    response = fetch(url, headers=headers)
+    if response.status_code == 304 and previous:
+        return previous[3]
+
+    response.raise_for_status()
+    return _parse_changed(url, previous, response, parse)
+
+
+def _fetch_parsed_or_none(url, parse):
+    try:
+        return fetch_parsed(url, parse)
+    except Exception:
+        logger.exception("Failed to fetch %s", url)
+        return None
+
+
+def run_concurrently(func, items, max_workers=None):
+    """Calls func(item) for every item on a bounded thread pool, returning the results in order."""
+    items = list(items)
+    workers = min(max_workers or MAX_WORKERS, len(items))
+
+    if workers <= 1:
+        return [func(item) for item in items]
+
+    # Each call runs in a copy of the caller's context, so it counts towards the caller's request timing
+    context = contextvars.copy_context()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda item: context.copy().run(func, item), items))
+
+
+def fetch_all(urls, parse, max_workers=None):
+    """
+    Fetches and parses every URL on a bounded thread pool (see fetch_parsed).
+    Results are returned in the same order as `urls`; failed fetches are returned as None.
+    """
+    return run_concurrently(lambda url: _fetch_parsed_or_none(url, parse), urls, max_workers)
+
+
+# === Async fetching, for the ASGI serving mode (asgi.py) ===
+# httpx is only needed there, so it is imported on first use
+
+# event loop -> httpx.AsyncClient bound to it
+_async_clients = {}
+
+
+def get_async_client():
+    """Returns the httpx.AsyncClient of the running event loop, keeping connections alive between fetches."""
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = httpx.AsyncClient(
+            headers=HEADERS,
+            timeout=FETCH_TIMEOUT,
+            # Retries connection errors only; unlike the sync session, 429/5xx responses aren't retried
+            transport=httpx.AsyncHTTPTransport(retries=FETCH_RETRIES)
+        )
+    return client
+
+
+async def fetch_async(url, headers=None):
+    await rate_limiter.wait_async(url)
+    with span('fetch'):
+        return await get_async_client().get(url, headers=headers)
+
+
+async def fetch_parsed_async(url, parse):
+    """
+    Async counterpart of fetch_parsed, sharing its validators.
+    Waiting on formula1.com doesn't hold a thread, so one event loop can wait on many pages at once.
+    Loading the stored validators and parsing pages run on worker threads, so they don't block
+    the event loop either. Raises httpx.HTTPStatusError for error responses.
+    """
+    if not _validators_warmed:
+        await asyncio.to_thread(_warm_validators)
+    previous, headers = _conditional_headers(url)
+
+    response = await fetch_async(url, headers=headers)
+    if response.status_code == 304 and previous:
+        return previous[3]
+
+    response.raise_for_status()
+    # Parsing a full page takes tens of milliseconds of CPU, long enough to stall every other request
+    return await asyncio.to_thread(_parse_changed, url, previous, response, parse)
+
+
+def clear_validators():
+    global _validators_warmed
+    with _validators_lock:
+        _validators.clear()
+        _validators_warmed = True
+    if _validators_store is not None:
+        _validators_store.mark_dirty()
@@ -0,0 +1,57 @@
+import json
+import os
+import threading
+
+# Service account key used when FIREBASE_KEY_PATH isn't set, for local development
+LOCAL_KEY_PATH = "C:/Users/User/OneDrive - National Institute of Business Management (1)/Personal/MAD/Coursework/formula-one-api.json"
+
+_db = None
+_async_db = None
+_lock = threading.Lock()
+
+
+def _initialize_app():
+    # firebase_admin and the Firestore/gRPC stack take a few hundred milliseconds to import,
+    # so they are only loaded once something actually talks to Firestore
+    import firebase_admin
+    from firebase_admin import credentials
+
+    if not firebase_admin._apps:
+        firebase_key_path = os.getenv('FIREBASE_KEY_PATH')
+        if not firebase_key_path:
+            cred = credentials.Certificate(LOCAL_KEY_PATH)
+        else:
+            cred = credentials.Certificate(json.loads(firebase_key_path))
+        firebase_admin.initialize_app(cred)
+
+
+def get_db():
+    """Returns the process-wide Firestore client, initializing Firebase on first use."""
+    global _db
+    if _db is None:
+        with _lock:
+            if _db is None:
+                _initialize_app()
+                from firebase_admin import firestore
+                _db = firestore.client()
+    return _db
+
+
+def get_async_db():
+    """Returns the process-wide async Firestore client, for the ASGI serving mode."""
+    global _async_db
+    if _async_db is None:
+        with _lock:
+            if _async_db is None:
+                _initialize_app()
+                from firebase_admin import firestore_async
+                _async_db = firestore_async.client()
+    return _async_db
+
+
+def use_clients(db, async_db=None):
+    """Makes get_db() and get_async_db() return the given clients, e.g. an in-memory stand-in in benchmarks."""
+    global _db, _async_db
+    with _lock:
+        _db = db
+        _async_db = async_db
@@ -0,0 +1,92 @@
+from search import SearchIndex
+
+
+def _field_values(record, field):
+    value = record.get(field)
+    if isinstance(value, list):
+        return [v for v in value if v]
+    return [value] if value else []
+
+
+class EntityIndex:
+    """
+    Read-only lookups over one scraped entity list.
+
+    An index is built once per cache refresh and stored in the cache in place of the
+    bare list, so swapping the cache entry replaces the list and all of its lookups at once.
+    Callers must treat the records and views as immutable.
+    Name and group fields may hold a string or a list of strings, and are matched case-insensitively.
+    `search_fields` maps fields to search ranking weights (see search.SearchIndex).
+    """
+
+    def __init__(self, records, id_field, name_fields=(), group_fields=(), points_field=None, top_n=3,
+                 search_fields=None):
+        self.records = records
+        self.by_id = {record[id_field]: record for record in records}
+
+        self.by_name = {}
+        for field in name_fields:
+            for record in records:
+                for value in _field_values(record, field):
+                    self.by_name.setdefault(value.lower(), record)
+
+        self.groups = {}
+        for field in group_fields:
+            groups = self.groups[field] = {}
+            for record in records:
+                for value in _field_values(record, field):
+                    groups.setdefault(value.lower(), []).append(record)
+
+        if points_field:
+            self.by_points = sorted(records, key=lambda record: record[points_field], reverse=True)
+        else:
+            self.by_points = list(records)
+        self.top_n = top_n
+        self.top = self.by_points[:top_n]
+        self.search_index = SearchIndex(records, search_fields or {})
+
+    def __bool__(self):
+        # An empty scrape yields a falsy index, so EntityCache doesn't cache it
+        return bool(self.records)
+
+    def get(self, record_id):
+        return self.by_id.get(record_id)
+
+    def get_by_name(self, name):
+        return self.by_name.get(name.lower())
+
+    def group(self, field, value):
+        return self.groups[field].get(value.lower(), [])
+
+    def top_by_points(self, n):
+        return self.top if n == self.top_n else self.by_points[:n]
+
+    def search(self, query, limit=None, fields=None):
+        return self.search_index.search(query, limit=limit, fields=fields)
+
+
+# Indexes of each entity, shared by the scrapers' caches and the API's Firestore snapshots
+
+def build_race_index(races):
+    return EntityIndex(
+        races, 'race_id',
+        name_fields=('grand_prix_name',),
+        search_fields={'grand_prix_name': 3, 'location': 2}
+    )
+
+def build_driver_index(drivers):
+    return EntityIndex(
+        drivers, 'driver_id',
+        name_fields=('name',),
+        group_fields=('team',),
+        points_field='driver_points',
+        search_fields={'name': 3, 'team': 2, 'nationality': 1}
+    )
+
+def build_team_index(teams):
+    return EntityIndex(
+        teams, 'team_id',
+        name_fields=('team_name',),
+        points_field='team_points',
+        search_fields={'team_name': 3, 'drivers': 2}
+    )
@@ -0,0 +1,75 @@
+def _split(value):
+    return [part.strip() for part in value.split(',') if part.strip()] if value else []
+
+
+def non_negative_int(args, name):
+    """Returns the ?`name`= argument of `args` as an int, or None if absent. Raises ValueError if it isn't a non-negative integer."""
+    value = args.get(name)
+    if value is None or value == '':
+        return None
+    if not value.isdigit():
+        raise ValueError(f'?{name}= must be a non-negative integer')
+    return int(value)
+
+
+def _ids(args):
+    ids = _split(args.get('ids'))
+    if not all(record_id.isdigit() for record_id in ids):
+        raise ValueError('?ids= must be a comma-separated list of integer IDs')
+    return [int(record_id) for record_id in ids] or None
+
+
+def parse_list_args(args):
+    """
+    Reads the ?ids=, ?fields=, ?sort=, ?limit= and ?offset= list parameters from request `args`.
+
+    ids: comma-separated IDs of the records to return, in that order, e.g. ?ids=1,4,7
+    fields: comma-separated fields to keep in every record, e.g. ?fields=name,team,driver_points
+    sort: comma-separated fields to order by, each optionally prefixed with - for descending,
+          e.g. ?sort=-driver_points,name
+    Raises ValueError with a message for the client when a parameter is malformed.
+    """
+    return {
+        'ids': _ids(args),
+        'fields': _split(args.get('fields')) or None,
+        'sort': _split(args.get('sort')) or None,
+        'limit': non_negative_int(args, 'limit'),
+        'offset': non_negative_int(args, 'offset') or 0
+    }
+
+
+def _sorted(records, sort):
+    # One stable pass per field, last field first, so earlier fields take precedence.
+    # Records missing a field always go last.
+    for field in reversed(sort):
+        descending = field.startswith('-')
+        field = field.lstrip('-')
+        present = [record for record in records if record.get(field) is not None]
+        missing = [record for record in records if record.get(field) is None]
+        try:
+            present.sort(key=lambda record: record[field], reverse=descending)
+        except TypeError:
+            raise ValueError(f'Cannot sort by {field}, its values have mixed types')
+        records = present + missing
+    return records
+
+
+def apply_list_args(records, id_field, ids=None, fields=None, sort=None, limit=None, offset=0):
+    """
+    Returns (page, total): the records selected, sorted, sliced and projected as requested, and
+    the number of records before slicing. `records` itself is left untouched, since it is
+    shared with other requests; only the requested slice is copied.
+    """
+    if ids:
+        by_id = {record.get(id_field): record for record in records}
+        records = [by_id[record_id] for record_id in ids if record_id in by_id]
+    if sort:
+        records = _sorted(records, sort)
+
+    total = len(records)
+    end = None if limit is None else offset + limit
+    page = records[offset:end]
+
+    if fields:
+        page = [{field: record[field] for field in fields if field in record} for record in page]
+    return page, total
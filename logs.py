@@ -0,0 +1,45 @@
+import json
+import logging
+import os
+import sys
+
+# Minimum level logged: DEBUG, INFO, WARNING or ERROR
+LOG_LEVEL = os.getenv('F1_LOG_LEVEL', 'INFO').upper()
+# 'text' for human-readable lines, 'json' for one JSON object per line (e.g. for Vercel's log drains)
+LOG_FORMAT = os.getenv('F1_LOG_FORMAT', 'text')
+
+# Attributes every LogRecord has; anything else on a record was passed in `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as a JSON object with its level, logger, message and the fields passed in `extra`."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging():
+    """Sends the app's logs to stderr at LOG_LEVEL, unless the root logger was configured already."""
+    root = logging.getLogger()
+    if root.handlers:
+        return
+
+    handler = logging.StreamHandler(sys.stderr)
+    if LOG_FORMAT == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    # httpx logs every request it makes at INFO
+    logging.getLogger('httpx').setLevel(max(root.level, logging.WARNING))
@@ -0,0 +1,167 @@
+"""
+In-process metrics: latency per route, time spent per stage of a request (fetching and
+parsing formula1.com pages, Firestore reads and writes) and cache hit ratios, rendered in
+the Prometheus text format for /api/metrics. Each request's stage timings are also sent
+back in its Server-Timing header.
+
+Metrics are kept per process: with several workers, every worker reports its own.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names, values):
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return f'{{{pairs}}}' if pairs else ''
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    """Prometheus histogram with one series per combination of label values."""
+
+    def __init__(self, name, help, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        # label values -> [count per bucket (the last one +Inf), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labels, [list(counts), total, count]) for labels, (counts, total, count) in self._series.items())
+
+        for label_values, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                labels = _labels(self.label_names + ('le',), label_values + (le,))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _labels(self.label_names, label_values)
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+request_duration = Histogram(
+    'f1_request_duration_seconds', 'Time taken to serve a request, by route.', ('method', 'route', 'status')
+)
+stage_duration = Histogram(
+    'f1_stage_duration_seconds', 'Time spent in each stage: fetch, parse, firestore_read, firestore_write.', ('stage',)
+)
+
+
+class RequestTiming:
+    """
+    Stage timings of one request, for its Server-Timing header. Timings of nested requests
+    (the sub-requests of a batch) are added to their parent's too.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.start = time.perf_counter()
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            total, count = self.stages.get(stage, (0.0, 0))
+            self.stages[stage] = (total + seconds, count + 1)
+        if self.parent is not None:
+            self.parent.add(stage, seconds)
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def header(self):
+        with self._lock:
+            stages = sorted(self.stages.items())
+        entries = [f'{stage};dur={total * 1000:.1f};desc="{count}x"' for stage, (total, count) in stages]
+        entries.append(f'total;dur={self.elapsed() * 1000:.1f}')
+        return ', '.join(entries)
+
+
+# Timing of the request being served; fetcher.run_concurrently carries it over to its pool threads
+_current = contextvars.ContextVar('request_timing', default=None)
+
+
+def start_request():
+    timing = RequestTiming(_current.get())
+    _current.set(timing)
+    return timing
+
+
+def finish_request(timing, method, route, status):
+    """Records the request's latency, and makes its parent (if any) the current request again."""
+    request_duration.observe(timing.elapsed(), method, route, status)
+    end_request(timing)
+
+
+def end_request(timing):
+    if _current.get() is timing:
+        _current.set(timing.parent)
+
+
+@contextmanager
+def span(stage):
+    """Times the enclosed block as `stage`, in the stage histogram and the current request's Server-Timing."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_duration.observe(elapsed, stage)
+        timing = _current.get()
+        if timing is not None:
+            timing.add(stage, elapsed)
+
+
+def _cache_lines():
+    from cache import cache_stats
+
+    stats = cache_stats()
+    lines = []
+    for metric, kind, help, value in [
+        ('f1_cache_hits_total', 'counter', 'Lookups served from a fresh cache entry.', lambda s: s['hits']),
+        ('f1_cache_stale_hits_total', 'counter', 'Lookups served from a stale entry while it is reloaded.', lambda s: s['stale_hits']),
+        ('f1_cache_misses_total', 'counter', 'Lookups that had to scrape.', lambda s: s['misses']),
+        ('f1_cache_evictions_total', 'counter', 'Entries evicted to make room.', lambda s: s['evictions']),
+        ('f1_cache_size', 'gauge', 'Entries in the cache.', lambda s: s['size']),
+        ('f1_cache_hit_ratio', 'gauge', 'Share of lookups served from the cache, fresh or stale.', _hit_ratio),
+    ]:
+        lines += [f'# HELP {metric} {help}', f'# TYPE {metric} {kind}']
+        lines += [f'{metric}{_labels(("cache",), (s["name"],))} {value(s)}' for s in stats]
+    return lines
+
+
+def _hit_ratio(stats):
+    served = stats['hits'] + stats['stale_hits']
+    lookups = served + stats['misses']
+    return served / lookups if lookups else 0.0
+
+
+def render():
+    """Returns every metric in the Prometheus text exposition format."""
+    lines = request_duration.render() + stage_duration.render() + _cache_lines()
+    return '\n'.join(lines) + '\n'
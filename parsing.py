@@ -0,0 +1,63 @@
+import os
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+    DEFAULT_PARSER = 'lxml'
+except ImportError:
+    DEFAULT_PARSER = 'html.parser'
+
+# BeautifulSoup tree builder used by every scraper
+PARSER = os.getenv('F1_HTML_PARSER', DEFAULT_PARSER)
+# Set F1_SCOPED_PARSING=0 to always build the full page tree, e.g. if a strainer stops matching after a site change
+SCOPED_PARSING = os.getenv('F1_SCOPED_PARSING', '1') == '1'
+
+
+def make_soup(markup, parse_only=None):
+    """
+    Parses `markup` with PARSER.
+    `parse_only` is a SoupStrainer limiting the tree to the matching elements (and their
+    descendants), which skips building most of a several-hundred-KB formula1.com page.
+    """
+    if not SCOPED_PARSING:
+        parse_only = None
+    return BeautifulSoup(markup, PARSER, parse_only=parse_only)
+
+
+def strainer(name, classes=None, **attrs):
+    """
+    SoupStrainer matching `name` tags (any tag if None), optionally only those having any of
+    `classes` (each a single class or a run of space-separated classes) and matching `attrs`.
+
+    Strainers see the raw class attribute while the page is parsed, so a plain class_='group'
+    would only match class="group" exactly; a whole-word pattern is used instead.
+    """
+    if classes is None:
+        return SoupStrainer(name, **attrs)
+    if isinstance(classes, str):
+        classes = [classes]
+    pattern = '|'.join(re.escape(cls) for cls in classes)
+    return SoupStrainer(name, class_=re.compile(rf'(?:^|\s)(?:{pattern})(?:\s|$)'), **attrs)
+
+
+class _AnyOf(SoupStrainer):
+    def __init__(self, strainers):
+        super().__init__()
+        self.strainers = strainers
+
+    @property
+    def excludes_everything(self):
+        return all(each.excludes_everything for each in self.strainers)
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        return any(each.allow_tag_creation(nsprefix, name, attrs) for each in self.strainers)
+
+    def allow_string_creation(self, string):
+        return any(each.allow_string_creation(string) for each in self.strainers)
+
+
+def any_of(*strainers):
+    """Strainer keeping the elements any of `strainers` keeps, for pages read from blocks of different kinds."""
+    return _AnyOf(strainers)
@@ -0,0 +1,137 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+from cachetools import LRUCache
+from flask import Response, request
+from werkzeug.http import parse_accept_header, parse_etags
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Cache-Control lifetimes in seconds: clients revalidate after MAX_AGE, Vercel's edge cache keeps a response for S_MAXAGE
+MAX_AGE = int(os.getenv('F1_HTTP_MAX_AGE', '60'))
+S_MAXAGE = int(os.getenv('F1_HTTP_S_MAXAGE', '300'))
+# How long the edge may keep serving an expired response while it fetches a fresh one
+STALE_WHILE_REVALIDATE = int(os.getenv('F1_HTTP_STALE_WHILE_REVALIDATE', '600'))
+# Number of serialized responses kept for data that is shared between requests
+RESPONSE_CACHE_SIZE = int(os.getenv('F1_RESPONSE_CACHE_SIZE', '512'))
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 1024
+
+# Supported Content-Encodings, in order of preference
+ENCODERS = {}
+if brotli is not None:
+    ENCODERS['br'] = lambda body: brotli.compress(body, quality=5)
+ENCODERS['gzip'] = lambda body: gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def _default(value):
+    # Firestore timestamps and other datetimes
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dumps(data):
+    """Serializes `data` to compact UTF-8 JSON bytes with sorted keys, like jsonify, using orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, default=_default, sort_keys=True, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+class PreparedBody:
+    """
+    A JSON payload serialized once, with its strong ETag.
+    Compressed bodies are built on first use of each encoding and kept with it.
+    """
+
+    def __init__(self, data):
+        self.body = dumps(data)
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+        self.compressible = len(self.body) >= MIN_COMPRESS_SIZE
+        self._encoded = {}
+
+    def encode(self, encoding):
+        if encoding is None:
+            return self.body
+        body = self._encoded.get(encoding)
+        if body is None:
+            body = self._encoded[encoding] = ENCODERS[encoding](self.body)
+        return body
+
+
+_prepared = LRUCache(RESPONSE_CACHE_SIZE)
+_prepared_lock = threading.Lock()
+
+
+def prepare(data, key=None, source=None):
+    """
+    Returns the PreparedBody of `data`. With a `key`, it is kept and reused for as long as
+    later calls for the same key pass the same `source` object (see json_response).
+    """
+    if key is None:
+        return PreparedBody(data)
+
+    with _prepared_lock:
+        entry = _prepared.get(key)
+    # Cached data is replaced, never mutated, on refresh, so the same object means the same payload
+    if entry is not None and entry[0] is source:
+        return entry[1]
+
+    prepared = PreparedBody(data)
+    with _prepared_lock:
+        _prepared[key] = (source, prepared)
+    return prepared
+
+
+def cache_control():
+    return f'public, max-age={MAX_AGE}, s-maxage={S_MAXAGE}, stale-while-revalidate={STALE_WHILE_REVALIDATE}'
+
+
+def negotiate(prepared, accept_encoding):
+    """Returns (Content-Encoding or None, ETag) of the representation to send for an Accept-Encoding header value."""
+    encoding = None
+    if prepared.compressible:
+        encoding = parse_accept_header(accept_encoding).best_match(list(ENCODERS))
+    # Each encoding is a different representation, so it gets its own strong ETag
+    return encoding, f'{prepared.etag}-{encoding}' if encoding else prepared.etag
+
+
+def not_modified(etag, if_none_match):
+    return parse_etags(if_none_match).contains_weak(etag)
+
+
+def json_response(data, status=200, shared=False, source=None):
+    """
+    Returns `data` as a compressed, ETag-tagged JSON response for the current request,
+    or an empty 304 when the client's If-None-Match already has it.
+
+    Pass shared=True when `data` is a cached object handed unchanged to every request
+    (a Firestore snapshot or a scraper index view): its serialized and compressed bodies
+    are then built once and reused until the object is replaced by a refresh.
+    Pass the shared object as `source` instead when `data` was derived from it (a projected
+    or paginated view); the body is then reused for as long as the source stays the same.
+    """
+    if source is None and shared:
+        source = data
+    prepared = prepare(data, None if source is None else request.full_path, source)
+    encoding, etag = negotiate(prepared, request.headers.get('Accept-Encoding'))
+
+    response = Response(prepared.encode(encoding), status=status, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if request.method in ('GET', 'HEAD'):
+        response.headers['Cache-Control'] = cache_control()
+    if encoding:
+        response.content_encoding = encoding
+    response.set_etag(etag)
+    return response.make_conditional(request)
@@ -1,23 +1,127 @@
+import asyncio
+from datetime import datetime, timezone
 import requests
-from bs4 import BeautifulSoup
-from races import get_all_race_urls
-from sessions import get_race_sessions
+from cache import EntityCache, ttl_for
+from cadence import session_settled
+from fetcher import fetch_parsed, fetch_parsed_async, run_concurrently
+from parsing import make_soup, strainer
 
-def parse_session_results(session_url):
+# Results of a session that has settled (see cadence.session_settled) never change, so they are kept until evicted.
+# Sessions without results yet aren't cached (see EntityCache) and are re-checked on every request.
+cache = EntityCache('results', ttl=ttl_for('results', float('inf')), maxsize=512, persist=True)
+# Results of a running or just finished session are provisional: penalties and corrections may still change them
+recent_cache = EntityCache('results_recent', ttl=ttl_for('results_recent', 300), maxsize=64)
+
+# Only the results table of a result page
+RESULTS_TABLE = strainer('table')
+
+# Result page of each session, relative to the race page. Longer names first,
+# so that "Sprint Qualifying" isn't taken for "Qualifying".
+SESSION_RESULT_PATHS = [
+    ('practice 1', 'practice/1'),
+    ('practice 2', 'practice/2'),
+    ('practice 3', 'practice/3'),
+    ('sprint qualifying', 'sprint-grid'),
+    ('sprint', 'sprint-result'),
+    ('qualifying', 'starting-grid'),
+    ('race', 'race-result')
+]
+
+def session_results_url(race_url, session_name):
+    session_name = (session_name or '').lower()
+    for name, path in SESSION_RESULT_PATHS:
+        if name in session_name:
+            return f"{race_url}/{path}"
+    return None
+
+def fetch_session_results(session_url):
     # Fetch the session page content
-    headers = {'User-Agent': 'Mozilla/5.0'}
-    response = requests.get(session_url, headers=headers)
-    soup = BeautifulSoup(response.content, 'html.parser')
+    try:
+        return fetch_parsed(session_url, parse_results_page)
+    except requests.HTTPError as e:
+        # Result pages of sessions that haven't run yet don't exist
+        if e.response is not None and e.response.status_code == 404:
+            return []
+        raise
+
+async def fetch_session_results_async(session_url):
+    # httpx is only installed for the ASGI serving mode
+    import httpx
+
+    try:
+        return await fetch_parsed_async(session_url, parse_results_page)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
+            return []
+        raise
+
+def _cache(settled):
+    return cache if settled else recent_cache
+
+def parse_session_results(session_url, settled=False):
+    """Returns the results of a session; `settled` ones are cached for good, others only briefly."""
+    return _cache(settled).get(session_url, lambda: fetch_session_results(session_url))
+
+async def parse_session_results_async(session_url, settled=False):
+    return await _cache(settled).get_async(session_url, lambda: fetch_session_results_async(session_url))
 
-    print(f"session_url: {session_url}")
-    print(soup.prettify())  # Pretty print the entire HTML structure
+def get_results_for_sessions(session_urls, settled=False):
+    """Returns the results of every session URL, fetching the uncached ones in parallel."""
+    return _cache(settled).get_many(session_urls, lambda missing: run_concurrently(fetch_session_results, missing))
+
+def _result_urls(race_url, sessions):
+    return [session_results_url(race_url, session.get('name')) for session in sessions]
+
+def _with_results(sessions, urls, results):
+    """Copies of `sessions` with the `results` of their result URL (in the order of the non-empty `urls`) added."""
+    results_by_url = dict(zip([url for url in urls if url], results))
+    sessions = [dict(session) for session in sessions]
+    for session, url in zip(sessions, urls):
+        if url:
+            session['results'] = results_by_url[url] or []
+    return sessions
+
+def get_results_for_races(race_sessions):
+    """
+    Returns {race_url: copies of its sessions with a 'results' list added to each session that has
+    a result page} for {race_url: sessions}. The uncached result pages of all races are fetched in parallel.
+    """
+    now = datetime.now(timezone.utc)
+    urls = {race_url: _result_urls(race_url, sessions) for race_url, sessions in race_sessions.items()}
+    settled, recent = [], []
+    for race_url, sessions in race_sessions.items():
+        for url, session in zip(urls[race_url], sessions):
+            if url:
+                (settled if session_settled(session, race_url, now) else recent).append(url)
+
+    results = dict(zip(settled, get_results_for_sessions(settled, settled=True)))
+    results.update(zip(recent, get_results_for_sessions(recent)))
+    return {
+        race_url: _with_results(sessions, urls[race_url], [results[url] for url in urls[race_url] if url])
+        for race_url, sessions in race_sessions.items()
+    }
+
+def get_race_results(race_url, sessions):
+    """Returns copies of `sessions` with a 'results' list added to each session that has a result page."""
+    return get_results_for_races({race_url: sessions})[race_url]
+
+async def get_race_results_async(race_url, sessions):
+    now = datetime.now(timezone.utc)
+    urls = _result_urls(race_url, sessions)
+    results = await asyncio.gather(*(
+        parse_session_results_async(url, session_settled(session, race_url, now))
+        for url, session in zip(urls, sessions) if url
+    ))
+    return _with_results(sessions, urls, results)
+
+def parse_results_page(response):
+    soup = make_soup(response.content, RESULTS_TABLE)
 
     # Initialize a list to store results
     results = []
 
     # Find the table that contains the results
     table = soup.find('table') #, class_='f1-table f1-table-with-data w-full')
-    print(f"session url - {session_url}\ttable - {table}")
 
     if table:
         rows = table.find_all('tr', class_=['bg-brand-white', 'bg-grey-10'])  # Find rows with result data
@@ -35,4 +139,8 @@ def parse_session_results(session_url):
                 }
                 results.append(result)
     
-    return results
\ No newline at end of file
+    return results
+
+def clear_cache():
+    cache.clear()
+    recent_cache.clear()
@@ -0,0 +1,120 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Fallback wait, in seconds, when a job's interval callable fails
+DEFAULT_INTERVAL = 600
+
+
+def interval_for(name, default):
+    """Refresh interval for the `name` job (seconds, or a callable returning them), overridable with F1_REFRESH_INTERVAL_<NAME>."""
+    value = os.getenv(f'F1_REFRESH_INTERVAL_{name.upper()}')
+    return float(value) if value else default
+
+
+class RefreshScheduler:
+    """
+    Background thread that re-runs each registered refresh job every `interval` seconds,
+    so data is refreshed ahead of requests instead of inside them.
+
+    Every job runs on its own worker, and a job still running when it comes due again
+    is skipped rather than started twice. `interval` may be a callable, evaluated after
+    each run, for jobs whose cadence depends on the race calendar.
+    """
+
+    def __init__(self, tick=1.0):
+        self.tick = tick
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pool = None
+
+    def register(self, name, interval, refresh):
+        with self._lock:
+            self.jobs[name] = {
+                'interval': interval,
+                'refresh': refresh,
+                'next_run': time.time(),
+                'last_run': None,
+                'last_duration': None,
+                'last_error': None,
+                'running': False
+            }
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._pool = ThreadPoolExecutor(max_workers=max(len(self.jobs), 1), thread_name_prefix='refresh')
+        self._thread = threading.Thread(target=self._run, name='refresh-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.time()
+            with self._lock:
+                for name, job in self.jobs.items():
+                    if not job['running'] and job['next_run'] <= now:
+                        job['running'] = True
+                        self._pool.submit(self._run_job, name, job)
+            self._stop.wait(self.tick)
+
+    def _run_job(self, name, job):
+        start = time.time()
+        error = None
+        try:
+            job['refresh']()
+        except Exception as e:
+            error = str(e)
+            logger.exception("Scheduled refresh of %s failed", name)
+        finally:
+            with self._lock:
+                job['last_run'] = start
+                job['last_duration'] = time.time() - start
+                job['last_error'] = error
+                job['next_run'] = time.time() + self._interval(name, job)
+                job['running'] = False
+
+    def _interval(self, name, job):
+        if not callable(job['interval']):
+            return job['interval']
+        try:
+            return job['interval']()
+        except Exception:
+            logger.exception("Failed to work out the next refresh of %s", name)
+            return DEFAULT_INTERVAL
+
+    def status(self):
+        def timestamp(value):
+            return datetime.fromtimestamp(value).isoformat(timespec='seconds') if value else None
+
+        with self._lock:
+            return {
+                name: {
+                    'interval': None if callable(job['interval']) else job['interval'],
+                    'running': job['running'],
+                    'last_run': timestamp(job['last_run']),
+                    'last_duration': job['last_duration'],
+                    'last_error': job['last_error'],
+                    'next_run': timestamp(job['next_run'])
+                }
+                for name, job in self.jobs.items()
+            }
@@ -0,0 +1,99 @@
+import unicodedata
+
+# Length of the n-grams queries are matched with; shorter queries are looked up directly
+GRAM_SIZE = 3
+
+EXACT, FIELD_PREFIX, WORD_PREFIX, SUBSTRING = 4, 3, 2, 1
+
+
+def fold(text):
+    """Case-folds `text`, strips accents ("Pérez" -> "perez") and collapses whitespace."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.casefold().split())
+
+
+def _match_quality(query, text):
+    if query == text:
+        return EXACT
+    if text.startswith(query):
+        return FIELD_PREFIX
+    if f' {query}' in f' {text}':
+        return WORD_PREFIX
+    if query in text:
+        return SUBSTRING
+    return 0
+
+
+class SearchIndex:
+    """
+    Accent-insensitive substring search over a fixed list of records.
+
+    `fields` maps record fields (string or list-of-string values) to a ranking weight.
+    Every folded field value is split into character trigrams, so a query only has to
+    look at the records sharing all of its trigrams instead of scanning every record.
+    Shorter substrings are indexed whole, so one- and two-letter typeahead queries are a single lookup.
+    Results are ranked by weight x match quality (exact > prefix > word prefix > substring),
+    ties keeping the original record order.
+    """
+
+    def __init__(self, records, fields):
+        self.records = records
+        self.fields = fields
+        self._texts = []
+        self._grams = {}
+        self._short_grams = {}
+
+        for position, record in enumerate(records):
+            texts = []
+            for field in fields:
+                value = record.get(field)
+                values = value if isinstance(value, list) else [value]
+                for v in values:
+                    if isinstance(v, str) and v.strip():
+                        texts.append((field, fold(v)))
+            self._texts.append(texts)
+
+            for _, text in texts:
+                for i in range(len(text) - GRAM_SIZE + 1):
+                    self._grams.setdefault(text[i:i + GRAM_SIZE], set()).add(position)
+                for size in range(1, GRAM_SIZE):
+                    for i in range(len(text) - size + 1):
+                        self._short_grams.setdefault(text[i:i + size], set()).add(position)
+
+    def _candidates(self, query):
+        if len(query) < GRAM_SIZE:
+            return self._short_grams.get(query, set())
+
+        postings = []
+        for i in range(len(query) - GRAM_SIZE + 1):
+            posting = self._grams.get(query[i:i + GRAM_SIZE])
+            if not posting:
+                return set()
+            postings.append(posting)
+
+        postings.sort(key=len)
+        return postings[0].intersection(*postings[1:])
+
+    def search(self, query, limit=None, fields=None):
+        """Returns the records matching `query`, best first. `fields` restricts matching to those fields."""
+        query = fold(query)
+        if not query:
+            return []
+
+        scored = []
+        for position in self._candidates(query):
+            score = 0
+            for field, text in self._texts[position]:
+                if fields is not None and field not in fields:
+                    continue
+                quality = _match_quality(query, text)
+                if quality:
+                    score = max(score, quality * self.fields[field])
+            if score:
+                scored.append((-score, position))
+
+        scored.sort()
+        if limit is not None:
+            scored = scored[:limit]
+        return [self.records[position] for _, position in scored]
@@ -0,0 +1,36 @@
+import os
+
+# Season served when a request doesn't ask for one, and the only one the update jobs refresh
+CURRENT_SEASON = int(os.getenv('F1_CURRENT_SEASON', '2025'))
+# First season formula1.com has a race calendar for
+FIRST_SEASON = 1950
+
+
+class SeasonError(ValueError):
+    pass
+
+
+def parse_season(value):
+    """Returns the season asked for by `value` (e.g. a ?season= argument), or CURRENT_SEASON if it's empty."""
+    if value is None or value == '':
+        return CURRENT_SEASON
+    try:
+        season = int(value)
+    except (TypeError, ValueError):
+        raise SeasonError(f'Invalid season {value!r}.')
+    if not FIRST_SEASON <= season <= CURRENT_SEASON:
+        raise SeasonError(f'Season must be between {FIRST_SEASON} and {CURRENT_SEASON}.')
+    return season
+
+
+def is_frozen(season):
+    """Past seasons are complete: once loaded, they are never scraped again."""
+    return season < CURRENT_SEASON
+
+
+def season_collection(name, season):
+    """
+    Firestore collection holding `name` (e.g. 'races') for `season`: the top-level collection
+    for the current season, and a subcollection of seasons/<season> for past ones.
+    """
+    return name if season == CURRENT_SEASON else f'seasons/{season}/{name}'
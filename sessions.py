@@ -1,20 +1,22 @@
-import requests
-from bs4 import BeautifulSoup
+from cache import EntityCache, ttl_for
+from fetcher import fetch_all, fetch_parsed, fetch_parsed_async
+from parsing import make_soup, strainer
 from races import get_all_race_urls
 
-cached_sessions = []
+# One entry per race page, keyed by race URL
+cache = EntityCache('sessions', ttl=ttl_for('sessions', 3600), maxsize=64, persist=True)
 
-def get_race_sessions(race_url):
-    global cached_sessions
-    if cached_sessions:
-        return cached_sessions
+SESSION_BLOCK_CLASS = 'relative px-xs py-s tablet:p-normal tablet:pl-0 tablet:pr-normal rounded-md flex flex-wrap tablet:flex-nowrap mt-micro items-center bg-white'
+SESSION_BLOCK_CLASS_PADDED = f'{SESSION_BLOCK_CLASS} pr-l'
+
+# Only the session blocks of the race page
+SESSION_BLOCKS = strainer('div', [SESSION_BLOCK_CLASS, SESSION_BLOCK_CLASS_PADDED])
 
-    headers = {'User-Agent': 'Mozilla/5.0'}
-    response = requests.get(race_url, headers=headers)
-    soup = BeautifulSoup(response.content, 'html.parser')
+def parse_race_sessions(response):
+    soup = make_soup(response.content, SESSION_BLOCKS)
 
-    session_blocks1 = soup.find_all('div', class_='relative px-xs py-s tablet:p-normal tablet:pl-0 tablet:pr-normal rounded-md flex flex-wrap tablet:flex-nowrap mt-micro items-center bg-white')
-    session_blocks2 = soup.find_all('div', class_='relative px-xs py-s tablet:p-normal tablet:pl-0 tablet:pr-normal rounded-md flex flex-wrap tablet:flex-nowrap mt-micro items-center bg-white pr-l')
+    session_blocks1 = soup.find_all('div', class_=SESSION_BLOCK_CLASS)
+    session_blocks2 = soup.find_all('div', class_=SESSION_BLOCK_CLASS_PADDED)
 
     all_sessions = session_blocks1 + [b for b in session_blocks2 if b not in session_blocks1]
 
@@ -43,6 +45,32 @@ def get_race_sessions(race_url):
 
     return session_list
 
+def get_race_sessions(race_url):
+    return cache.get(race_url, lambda: fetch_parsed(race_url, parse_race_sessions))
+
+async def get_race_sessions_async(race_url):
+    return await cache.get_async(race_url, lambda: fetch_parsed_async(race_url, parse_race_sessions))
+
+def get_sessions_for_races(race_urls):
+    """
+    Returns a {race_url: sessions} dict for every URL in `race_urls`.
+    Race pages that aren't cached yet are fetched in parallel; pages that fail to load map to [].
+    """
+    race_urls = list(race_urls)
+    sessions = cache.get_many(race_urls, lambda missing: fetch_all(missing, parse_race_sessions))
+    return {race_url: race_sessions or [] for race_url, race_sessions in zip(race_urls, sessions)}
+
+def refresh_sessions(race_urls=None):
+    """Re-scrapes the sessions of `race_urls` (by default every race on the calendar) in parallel."""
+    if race_urls is None:
+        race_urls = get_all_race_urls()
+    return cache.refresh_many(race_urls, lambda urls: fetch_all(urls, parse_race_sessions))
+
+def refresh_sessions_for_races(race_urls):
+    """Like get_sessions_for_races, re-scraping every race page instead of reading cached sessions."""
+    race_urls = list(dict.fromkeys(race_urls))
+    sessions = refresh_sessions(race_urls)
+    return {race_url: race_sessions or [] for race_url, race_sessions in zip(race_urls, sessions)}
+
 def clear_cache():
-    global cached_sessions
-    cached_sessions = []
+    cache.clear()
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import threading
+
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+
+def metadata_version(metadata):
+    """The version stamp of a metadata document snapshot; `last_updated` for documents written before it had one."""
+    if not metadata.exists:
+        return None
+    fields = metadata.to_dict()
+    return fields.get('version', fields.get('last_updated'))
+
+
+class CollectionSnapshot:
+    """
+    In-process read-through copy of a Firestore collection.
+
+    The collection's `metadata` document carries a `version` stamp that the update jobs
+    rewrite after every write (see update_firestore_data.metadata_stamp). A request
+    only reads that one document and re-streams the collection when the stamp changed.
+    With `listen=True` an on_snapshot listener keeps the stamp current instead, so
+    requests served from an up-to-date snapshot cost no reads at all.
+
+    A `frozen` collection (a past season) doesn't change once loaded: as soon as the
+    snapshot holds documents, it is served without checking the stamp.
+    """
+
+    def __init__(self, db, collection_name, listen=False, frozen=False):
+        self.db = db
+        self.collection_name = collection_name
+        self.frozen = frozen
+        self.docs = None
+        self.version = None
+        self._latest_version = None
+        self._listener = None
+        self._lock = threading.Lock()
+        self._async_lock = None
+
+        if listen:
+            self._listener = self._metadata_ref().on_snapshot(self._on_metadata)
+
+    def _metadata_ref(self):
+        return self.db.collection(self.collection_name).document('metadata')
+
+    def _read_version(self):
+        with span('firestore_read'):
+            metadata = self._metadata_ref().get()
+        return metadata_version(metadata)
+
+    def _on_metadata(self, doc_snapshots, changes, read_time):
+        try:
+            for metadata in doc_snapshots:
+                self._latest_version = metadata_version(metadata)
+        except Exception:
+            logger.exception("Failed to handle %s metadata update", self.collection_name)
+
+    def get(self):
+        if self.frozen and self.docs:
+            return self.docs
+        if self._listener is not None and self.docs is not None and self.version == self._latest_version:
+            return self.docs
+
+        version = self._latest_version if self._listener is not None else self._read_version()
+        if self.docs is not None and version == self.version:
+            return self.docs
+
+        with self._lock:
+            # Another request may have reloaded the collection while we waited
+            if self.docs is None or version != self.version:
+                with span('firestore_read'):
+                    docs = self.db.collection(self.collection_name).stream()
+                    self.docs = [doc.to_dict() for doc in docs if doc.id != 'metadata']
+                self.version = version
+            return self.docs
+
+    async def get_async(self, async_db):
+        """Like get(), reading through `async_db`, a Firestore AsyncClient, without blocking the event loop."""
+        if self.frozen and self.docs:
+            return self.docs
+        if self._listener is not None and self.docs is not None and self.version == self._latest_version:
+            return self.docs
+
+        if self._listener is not None:
+            version = self._latest_version
+        else:
+            with span('firestore_read'):
+                metadata = await async_db.collection(self.collection_name).document('metadata').get()
+            version = metadata_version(metadata)
+        if self.docs is not None and version == self.version:
+            return self.docs
+
+        # The event loop is single-threaded, so an asyncio lock is enough to let one coroutine reload at a time
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            if self.docs is None or version != self.version:
+                with span('firestore_read'):
+                    docs = [doc.to_dict() async for doc in async_db.collection(self.collection_name).stream() if doc.id != 'metadata']
+                with self._lock:
+                    self.docs = docs
+                    self.version = version
+            return self.docs
+
+    def invalidate(self):
+        with self._lock:
+            self.docs = None
+            self.version = None
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.unsubscribe()
+            self._listener = None
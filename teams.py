@@ -1,22 +1,24 @@
-import requests
-from bs4 import BeautifulSoup
-import traceback
+import logging
+from cache import EntityCache, ttl_for
+from fetcher import BASE_URL, fetch_all, fetch_parsed
+from indexes import build_team_index
+from parsing import any_of, make_soup, strainer
 
-cached_teams = []
+logger = logging.getLogger(__name__)
 
-def get_all_teams():
-    global cached_teams
-    if cached_teams:
-        return cached_teams
+cache = EntityCache('teams', ttl=ttl_for('teams', 1800),
+                    persist=True, encode=lambda index: index.records, decode=build_team_index)
+
+# Only the parts of the listing page parse_team_cards looks at
+TEAM_CARDS = strainer('a', 'group')
+# Only the facts list and the description of a team profile
+TEAM_PROFILE = any_of(strainer('dl'), strainer(None, 'f1-atomic-wysiwyg'))
 
-    base_url = "https://www.formula1.com"
-    url = f"{base_url}/en/teams"
-    headers = {'User-Agent': 'Mozilla/5.0'}
-    response = requests.get(url, headers=headers)
-    soup = BeautifulSoup(response.text, 'html.parser')
+def parse_team_cards(response):
+    soup = make_soup(response.text, TEAM_CARDS)
 
     team_cards = soup.select('a.group')
-    teams = []
+    cards = []
 
     for idx, card in enumerate(team_cards, start=1):
         try:
@@ -33,89 +35,88 @@ def get_all_teams():
                 full = f"{first} {last}"
                 drivers.append(full)
 
-            team_url = f"{base_url}{card['href']}"
-            team_response = requests.get(team_url, headers=headers)
-            team_soup = BeautifulSoup(team_response.text, 'html.parser')
-
-            def extract(label):
-                element = team_soup.select_one(f'dt:contains("{label}") + dd')
-                return element.text.strip() if element else "N/A"
-
-            full_team_name = extract("Full Team Name")
-            base = extract("Base")
-            team_chief = extract("Team Chief")
-            technical_chief = extract("Technical Chief")
-            chassis = extract("Chassis")
-            power_unit = extract("Power Unit")
-            first_team_entry = extract("First Team Entry")
-            world_championships = extract("World Championships")
-            highest_race_finish = extract("Highest Race Finish")
-            pole_positions = extract("Pole Positions")
-            fastest_laps = extract("Fastest Laps")
-
-            team_profile_elem = team_soup.select_one('.f1-atomic-wysiwyg')
-            team_profile = team_profile_elem.text.strip() if team_profile_elem else "No profile available"
-
-            team_data = {
+            team_url = f"{BASE_URL}{card['href']}"
+
+            cards.append((team_url, {
                 'team_id': idx,
                 'team_name': team_name,
                 'team_logo': team_logo,
                 'team_car_image': team_car_image,
                 'team_points': int(team_points),
-                'drivers': drivers,
-                'full_team_name': full_team_name,
-                'base': base,
-                'team_chief': team_chief,
-                'technical_chief': technical_chief,
-                'chassis': chassis,
-                'power_unit': power_unit,
-                'first_team_entry': first_team_entry,
-                'world_championships': world_championships,
-                'highest_race_finish': highest_race_finish,
-                'pole_positions': pole_positions,
-                'fastest_laps': fastest_laps,
-                'team_profile': team_profile
-            }
-
-            teams.append(team_data)
-
-        except Exception as e:
-            print(f"[ERROR] Skipping team #{idx} due to error: {e}")
-            traceback.print_exc()
+                'drivers': drivers
+            }))
+
+        except Exception:
+            logger.exception("Skipping team card #%s", idx)
+            continue
+
+    return cards
+
+def parse_team_profile(response):
+    team_soup = make_soup(response.text, TEAM_PROFILE)
+
+    # Equivalent to select_one('dt:-soup-contains(label) + dd') per label, without re-walking the tree each time
+    facts = []
+    for dt in team_soup.find_all('dt'):
+        dd = dt.find_next_sibling()
+        if dd is not None and dd.name == 'dd':
+            facts.append((dt.get_text(), dd))
+
+    def extract(label):
+        element = next((dd for text, dd in facts if label in text), None)
+        return element.text.strip() if element else "N/A"
+
+    team_profile_elem = team_soup.select_one('.f1-atomic-wysiwyg')
+    team_profile = team_profile_elem.text.strip() if team_profile_elem else "No profile available"
+
+    return {
+        'full_team_name': extract("Full Team Name"),
+        'base': extract("Base"),
+        'team_chief': extract("Team Chief"),
+        'technical_chief': extract("Technical Chief"),
+        'chassis': extract("Chassis"),
+        'power_unit': extract("Power Unit"),
+        'first_team_entry': extract("First Team Entry"),
+        'world_championships': extract("World Championships"),
+        'highest_race_finish': extract("Highest Race Finish"),
+        'pole_positions': extract("Pole Positions"),
+        'fastest_laps': extract("Fastest Laps"),
+        'team_profile': team_profile
+    }
+
+def scrape_teams():
+    # Parsed pages may be handed back again on a 304, so build new dicts instead of mutating them
+    cards = fetch_parsed(f"{BASE_URL}/en/teams", parse_team_cards)
+
+    # Team pages are independent of each other, so fetch them concurrently
+    profiles = fetch_all((team_url for team_url, _ in cards), parse_team_profile)
+    teams = []
+
+    for (team_url, card), profile in zip(cards, profiles):
+        if profile is None:
+            logger.error("Skipping team #%s: team page unavailable", card['team_id'])
             continue
 
+        teams.append(dict(card, **profile))
+
     teams_sorted = sorted(teams, key=lambda x: x['team_name'].lower())
 
     for idx, team in enumerate(teams_sorted, start=1):
         team['team_id'] = idx
 
-    cached_teams = teams_sorted
     return teams_sorted
 
-def get_team_by_id(team_id):
-    return next((t for t in get_all_teams() if t['team_id'] == team_id), None)
-
-def get_team_by_driver(driver_name):
-    driver_name = driver_name.lower()
-    for team in get_all_teams():
-        if any(driver_name in d.lower() for d in team['drivers']):
-            return team
-    return None
+def load_team_index():
+    return build_team_index(scrape_teams())
 
-def get_teams_sorted_by_points():
-    return sorted(get_all_teams(), key=lambda x: x['team_points'], reverse=True)
+def get_team_index():
+    return cache.get('teams', load_team_index)
 
-def get_top_teams(n=3):
-    return get_teams_sorted_by_points()[:n]
+def refresh_teams():
+    return cache.refresh('teams', load_team_index)
 
-def search_teams(query):
-    query = query.lower()
-    results = []
-    for team in get_all_teams():
-        if query in team['team_name'].lower() or any(query in d.lower() for d in team['drivers']):
-            results.append(team)
-    return results
+def get_all_teams():
+    return get_team_index().records
 
 def clear_cache():
-    global cached_teams
-    cached_teams = []
+    cache.clear()
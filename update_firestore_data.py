@@ -1,118 +1,285 @@
-import os
 import json
-from datetime import datetime
-import firebase_admin
-from firebase_admin import credentials, firestore
+import hashlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
-from races import get_all_races, get_all_race_urls
-from drivers import get_all_drivers
-from teams import get_all_teams
-from circuits import get_circuit_info
-from sessions import get_race_sessions
+from firebase import get_db
+from logs import configure_logging
+from metrics import span
+from races import CALENDAR_FIELDS, refresh_races
+from seasons import CURRENT_SEASON, season_collection
+from drivers import refresh_drivers
+from teams import refresh_teams
+from circuits import refresh_circuits_for_races
+from sessions import refresh_sessions_for_races
 
+logger = logging.getLogger(__name__)
 
-# Firebase setup
-firebase_key_path = os.getenv('FIREBASE_KEY_PATH')
+# Firestore rejects write batches with more than 500 operations
+BATCH_LIMIT = 500
 
-if not firebase_admin._apps:
-    # If running locally, fallback to loading the local JSON key
-    if not firebase_key_path:
-        firebase_key_path = "C:/Users/User/OneDrive - National Institute of Business Management (1)/Personal/MAD/Coursework/formula-one-api.json"
-        cred = credentials.Certificate(firebase_key_path)
-    else:
-        firebase_key_path_dict = json.loads(firebase_key_path)
-        cred = credentials.Certificate(firebase_key_path_dict)
+def commit_in_batches(operations):
+    """
+    Applies `operations` (callables taking a WriteBatch) in as few batch commits as possible.
+    Up to BATCH_LIMIT operations are committed atomically together.
+    """
+    for start in range(0, len(operations), BATCH_LIMIT):
+        batch = get_db().batch()
+        for operation in operations[start:start + BATCH_LIMIT]:
+            operation(batch)
+        with span('firestore_write'):
+            batch.commit()
 
-    firebase_admin.initialize_app(cred)
+def metadata_stamp():
+    """
+    Metadata fields marking a collection as changed: the human-readable `last_updated`, and the
+    `version` that in-process snapshots compare, in nanoseconds so writes within a second differ.
+    """
+    return {'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'version': time.time_ns()}
 
-db = firestore.client()
+def stamp_metadata(collection_name):
+    """Returns a batch operation bumping the collection's metadata version, so in-process snapshots reload it."""
+    metadata_ref = get_db().collection(collection_name).document('metadata')
+    return lambda batch: batch.set(metadata_ref, metadata_stamp(), merge=True)
 
-def upload_to_firestore(collection_name, data):
-    collection_ref = db.collection(collection_name)
+def content_hash(item):
+    return hashlib.sha256(json.dumps(item, sort_keys=True, default=str).encode('utf-8')).hexdigest()
 
-    # Clear old documents (except metadata)
-    docs = collection_ref.stream()
-    for doc in docs:
-        if doc.id != 'metadata':
-            doc.reference.delete()
+def upsert_fields(item, fields):
+    """Returns `item` with every one of `fields` it lacks set to DELETE_FIELD, for a set(..., merge=True)."""
+    from google.cloud.firestore import DELETE_FIELD
 
-    # Upload new data
+    return {**{field: DELETE_FIELD for field in fields}, **item}
+
+def upload_to_firestore(collection_name, data, id_field, merge_fields=None):
+    """
+    Syncs `collection_name` with `data`, storing each item under the document ID str(item[id_field]).
+
+    The content hash of every document is kept in the metadata document, so only new or
+    changed items are written and items that disappeared are deleted. All writes, including
+    the metadata update, go in one batch (as long as they fit in BATCH_LIMIT), so readers
+    never see a half-written or empty collection.
+
+    With `merge_fields`, the fields the scraper owns, changed items are merged into their
+    documents instead of replacing them: those of `merge_fields` an item lacks are deleted,
+    and fields added by other jobs are kept.
+    """
+    if not data:
+        logger.warning("No %s scraped, keeping the existing documents.", collection_name)
+        return
+
+    collection_ref = get_db().collection(collection_name)
+    metadata_ref = collection_ref.document('metadata')
+    with span('firestore_read'):
+        metadata = metadata_ref.get()
+    old_hashes = metadata.to_dict().get('hashes') if metadata.exists else None
+
+    if old_hashes is None:
+        # Collection written before document IDs were stable: replace every document
+        with span('firestore_read'):
+            old_hashes = {doc.id: None for doc in collection_ref.list_documents() if doc.id != 'metadata'}
+
+    new_hashes = {}
+    operations = []
     for item in data:
-        collection_ref.add(item)
+        doc_id = str(item[id_field])
+        new_hashes[doc_id] = content_hash(item)
+        if old_hashes.get(doc_id) != new_hashes[doc_id]:
+            doc_ref = collection_ref.document(doc_id)
+            if merge_fields is None:
+                operations.append(lambda batch, doc_ref=doc_ref, item=item: batch.set(doc_ref, item))
+            else:
+                fields = upsert_fields(item, merge_fields)
+                operations.append(lambda batch, doc_ref=doc_ref, fields=fields: batch.set(doc_ref, fields, merge=True))
+
+    for doc_id in old_hashes:
+        if doc_id not in new_hashes:
+            doc_ref = collection_ref.document(doc_id)
+            operations.append(lambda batch, doc_ref=doc_ref: batch.delete(doc_ref))
 
-    # Update metadata
-    collection_ref.document('metadata').set({
-        'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    })
+    if not operations:
+        logger.info("No changes to %s.", collection_name)
+        return
 
-def update_races():
-    print("Updating races...")
-    races = get_all_races()
-    upload_to_firestore('races', races)
+    operations.append(lambda batch: batch.set(metadata_ref, {**metadata_stamp(), 'hashes': new_hashes}))
+    commit_in_batches(operations)
+    logger.info("Wrote %s %s document changes.", len(operations) - 1, collection_name)
+
+# The update jobs scrape through refresh_*, never the cached getters: a due update must store what
+# formula1.com shows now, not what a scraper cache loaded up to a TTL ago
+
+def update_races(season=CURRENT_SEASON):
+    logger.info("Updating races of %s...", season)
+    races = refresh_races(season).records
+    # Merged, so the sessions and circuit stored on each race survive calendar updates
+    upload_to_firestore(season_collection('races', season), races, 'race_id', merge_fields=CALENDAR_FIELDS)
 
 def update_drivers():
-    print("Updating drivers...")
-    drivers = get_all_drivers()
-    upload_to_firestore('drivers', drivers)
+    logger.info("Updating drivers...")
+    drivers = refresh_drivers().records
+    upload_to_firestore('drivers', drivers, 'driver_id')
 
 def update_teams():
-    print("Updating teams...")
-    teams = get_all_teams()
-    upload_to_firestore('teams', teams)
+    logger.info("Updating teams...")
+    teams = refresh_teams().records
+    upload_to_firestore('teams', teams, 'team_id')
+
+# Race document field -> function scraping it for a list of race URLs, returning {race_url: value}
+ENRICHMENTS = {
+    'circuit': refresh_circuits_for_races,
+    'sessions': refresh_sessions_for_races
+}
+
+def keep_stored_results(sessions, stored_sessions):
+    """
+    Copies of scraped `sessions` with the results stored on the race's sessions (by the results route
+    or backfill.py) kept, so a sessions update neither erases them nor rewrites races only to drop them.
+    """
+    stored = {session.get('name'): session['results'] for session in stored_sessions or [] if 'results' in session}
+    return [
+        {**session, 'results': stored[session.get('name')]} if 'results' not in session and session.get('name') in stored else session
+        for session in sessions
+    ]
+
+def enrich_races(fields, season=CURRENT_SEASON):
+    """
+    Scrapes each of `fields` (keys of ENRICHMENTS) for every race document of `season` and stores the results on it.
+
+    The race documents are streamed once and their references reused for the writes. The scrapes
+    for the different fields run side by side, each fanning out over the fetcher's worker pool,
+    and only values that differ from what is stored are written, in batches.
+    Returns how long each stage took, in seconds.
+    """
+    timings = {}
+    collection_name = season_collection('races', season)
+
+    start = time.perf_counter()
+    race_docs = []
+    with span('firestore_read'):
+        for doc in get_db().collection(collection_name).stream():
+            race = doc.to_dict()
+            race_url = race.get('url') or race.get('link')
+            if doc.id != 'metadata' and race_url:
+                race_docs.append((doc.reference, race, race_url))
+    timings['read'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    race_urls = list(dict.fromkeys(race_url for _, _, race_url in race_docs))
+    with ThreadPoolExecutor(max_workers=len(fields)) as pool:
+        scraped = dict(zip(fields, pool.map(lambda field: ENRICHMENTS[field](race_urls), fields)))
+    timings['scrape'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    operations = []
+    for doc_ref, race, race_url in race_docs:
+        changes = {}
+        for field in fields:
+            value = scraped[field].get(race_url)
+            if field == 'sessions' and value:
+                value = keep_stored_results(value, race.get('sessions'))
+            if not value:
+                logger.warning("No %s found for race: %s", field, race.get('grand_prix_name'))
+            elif value != race.get(field):
+                changes[field] = value
+
+        if changes:
+            operations.append(lambda batch, doc_ref=doc_ref, changes=changes: batch.update(doc_ref, changes))
+
+    if operations:
+        operations.append(stamp_metadata(collection_name))
+    commit_in_batches(operations)
+    timings['write'] = time.perf_counter() - start
+
+    logger.info(
+        "Updated %s on %s of %s races (read %.2fs, scrape %.2fs, write %.2fs)",
+        ', '.join(fields), max(len(operations) - 1, 0), len(race_docs),
+        timings['read'], timings['scrape'], timings['write'],
+        extra={'timings': timings}
+    )
+    return timings
+
+def write_race_fields(updates):
+    """Stores {(season, race_id): {field: value}} on the race documents, e.g. when flushed from a WriteBehindQueue."""
+    operations = []
+    collection_names = set()
+    for (season, race_id), fields in updates.items():
+        collection_name = season_collection('races', season)
+        doc_ref = get_db().collection(collection_name).document(str(race_id))
+        operations.append(lambda batch, doc_ref=doc_ref, fields=fields: batch.update(doc_ref, fields))
+        collection_names.add(collection_name)
+    operations += [stamp_metadata(collection_name) for collection_name in sorted(collection_names)]
+    commit_in_batches(operations)
+    logger.info("Wrote %s on %s races.", ', '.join(sorted({field for fields in updates.values() for field in fields})), len(updates))
 
 def update_circuits():
-    print("Updating circuits...")
-    race_docs = db.collection('races').stream()
-
-    for doc in race_docs:
-        race = doc.to_dict()
-        race_url = race.get('url') or race.get('link')
-        if not race_url:
-            continue
-
-        try:
-            circuit_info = get_circuit_info(race_url)
-            docs = list(db.collection('races').where('link', '==', race_url).limit(1).stream())
-            if docs:
-                docs[0].reference.update({'circuit': circuit_info})
-            else:
-                print(f"No race found with link: {race_url}")
-            print(f"Updated circuit for race: {race.get('name')}")
-        except Exception as e:
-            print(f"Failed to update circuit for race {race.get('name')}: {e}")
+    logger.info("Updating circuits...")
+    return enrich_races(['circuit'])
 
 def update_sessions():
-    print("Updating sessions...")
-    race_docs = db.collection('races').stream()
-
-    for doc in race_docs:
-        race = doc.to_dict()
-        race_url = race.get('url') or race.get('link')
-        if not race_url:
-            continue
-
-        try:
-            sessions = get_race_sessions(race_url)
-            if sessions:
-                docs = list(db.collection('races').where('link', '==', race_url).limit(1).stream())
-                if docs:
-                    docs[0].reference.update({'sessions': sessions})
-                else:
-                    print(f"No race found with link: {race_url}")
-                # db.collection('races').document(doc.id).update({'sessions': sessions})
-                print(f"Updated sessions for race: {race.get('name')}")
-        except Exception as e:
-            print(f"Failed to update sessions for race {race.get('name')}: {e}")
+    logger.info("Updating sessions...")
+    return enrich_races(['sessions'])
+
+def update_enrichments():
+    logger.info("Updating circuits and sessions...")
+    return enrich_races(['circuit', 'sessions'])
 
+def season_metadata_ref(season):
+    return get_db().collection(season_collection('races', season)).document('metadata')
+
+def is_season_frozen(season):
+    """Whether a past season was loaded completely, see freeze_season."""
+    with span('firestore_read'):
+        metadata = season_metadata_ref(season).get()
+    return metadata.exists and bool(metadata.to_dict().get('frozen'))
+
+def freeze_season(season):
+    """Marks a past season as loaded for good: it is never scraped again unless forced."""
+    with span('firestore_write'):
+        season_metadata_ref(season).set({'frozen': True, **metadata_stamp()}, merge=True)
+
+def load_season(season, force=False):
+    """
+    Stores the races of a past season with their circuits and sessions. Past seasons don't change,
+    so this is done once: the season is then frozen and later calls return False without scraping
+    anything, unless `force` is set. See backfill.py for loading many seasons, with results.
+    """
+    if not force and is_season_frozen(season):
+        logger.info("Season %s is already loaded.", season)
+        return False
+
+    update_races(season)
+    enrich_races(['circuit', 'sessions'], season)
+    freeze_season(season)
+    logger.info("Loaded season %s.", season)
+    return True
+
+def get_last_refreshes():
+    """Returns {job: datetime} of the last time each update job ran, as recorded by record_refresh."""
+    with span('firestore_read'):
+        state = get_db().collection('refresh').document('state').get()
+    if not state.exists:
+        return {}
+    return {job: datetime.fromisoformat(value) for job, value in state.to_dict().items()}
+
+def record_refresh(job, when=None):
+    when = when or datetime.now(timezone.utc)
+    with span('firestore_write'):
+        get_db().collection('refresh').document('state').set({job: when.isoformat()}, merge=True)
 
 def update_all():
     update_races()
     update_drivers()
     update_teams()
-    update_circuits()
-    update_sessions()
-    print("Update complete.")
+    update_enrichments()
+
+    now = datetime.now(timezone.utc)
+    for job in ('races', 'drivers', 'teams', 'circuits', 'sessions'):
+        record_refresh(job, now)
+    logger.info("Update complete.")
 
 
 if __name__ == "__main__":
+    configure_logging()
     update_all()
@@ -0,0 +1,73 @@
+import atexit
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """
+    Collects field updates per document and writes them from a background thread.
+
+    Updates to the same key made before the next flush are merged (later values win),
+    so a burst of requests enriching the same race costs a single write. A flush runs
+    `delay` seconds after the first pending update and hands every pending update to
+    write({key: fields}) at once. Pending updates are also flushed when the process exits.
+    """
+
+    def __init__(self, name, write, delay=2.0):
+        self.name = name
+        self.write = write
+        self.delay = delay
+        self.queued = 0
+        self.coalesced = 0
+        self.written = 0
+        self.failed = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._timer = None
+        atexit.register(self.flush)
+
+    def put(self, key, fields):
+        with self._lock:
+            self.queued += 1
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = dict(fields)
+            else:
+                pending.update(fields)
+                self.coalesced += 1
+
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            updates, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        if not updates:
+            return
+        try:
+            self.write(updates)
+            self.written += len(updates)
+        except Exception:
+            # Dropped rather than retried: the scheduled updates persist the same data
+            self.failed += len(updates)
+            logger.exception("Failed to write %s pending %s updates", len(updates), self.name)
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'name': self.name,
+            'pending': pending,
+            'queued': self.queued,
+            'coalesced': self.coalesced,
+            'written': self.written,
+            'failed': self.failed
+        }